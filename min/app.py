@@ -1,14 +1,20 @@
 import streamlit as st
-import time
-import random
-from datetime import datetime
-import psycopg2 
-from graph import app as langgraph_app
+from datetime import date
+import pandas as pd
+from psycopg2.extras import RealDictCursor
+from psycopg2.pool import ThreadedConnectionPool
+from psycopg2.extensions import connection as PgConnection
+from contextlib import contextmanager
+from functools import lru_cache
+import math
 from state import State
 from langchain_core.messages import HumanMessage, AIMessage
 import json
 import os
+import asyncio
+import threading
 import urllib.parse
+from types import MappingProxyType
 
 # --- 초기 설정 및 데이터 ---
 
@@ -20,342 +26,378 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS 스타일 수정
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+KR:wght@400;500;700;900&display=swap');
-    html, body, [class*="st-"] {
-        font-family: 'Noto Sans KR', sans-serif;
-    }
-    :root {
-        --bg-gradient: linear-gradient(to bottom right, #FFFBF0, #FFFFFF, #FFF7E6);
-        --text-color: #5C3A00;
-        --subtext-color: #8C5A00;
-        --accent-color: #C8A96A;
-        --accent-light-color: #F5F1E8;
-        --primary-bg-color: #B38B4A;
-        --primary-hover-bg-color: #99753D;
-    }
-    .stApp {
-        background: var(--bg-gradient);
-    }
-    .card {
-        background-color: rgba(255, 255, 255, 0.9);
-        border: 1px solid rgba(200, 169, 106, 0.3);
-        border-radius: 24px;
-        padding: 2rem;
-        box-shadow: 0 4px 12px rgba(0, 0, 0, 0.05);
-        transition: all 0.3s ease-in-out;
-        margin-bottom: 1rem;
-        text-align: left;
-    }
-    .card:hover {
-        transform: scale(1.02);
-        box-shadow: 0 8px 24px rgba(0, 0, 0, 0.08);
-    }
-    .stButton > button {
-        width: 100%;
-        border-radius: 12px !important;
-        font-weight: 600;
-        padding: 12px 0;
-    }
-    .donut-chart-text {
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        transform: translate(-50%, -50%);
-        text-align: center;
-        font-weight: bold;
-    }
-    .donut-chart-percentage {
-        font-size: 2em;
-        color: var(--text-color);
-    }
-    .donut-chart-label {
-        font-size: 0.9em;
-        color: var(--subtext-color);
-        opacity: 0.8;
-    }
-    [data-testid="stChatInput"] {
-        background-color: rgba(255, 255, 255, 0.7);
-    }
-    /* 사이드바 스타일 추가 */
-    [data-testid="stSidebar"] {
-        background: linear-gradient(to bottom, #FFFBF0, #F5F1E8);
-        border-right: 1px solid #e0e0e0;
-        padding: 2rem;
-    }
-    .sidebar-logo {
-        text-align: center;
-        margin-bottom: 2rem;
-    }
-    .sidebar-logo h1 {
-        color: var(--accent-color);
-        font-weight: 900;
-        font-size: 2.5em;
-        margin: 0;
-    }
-    .sidebar-logo p {
-        color: var(--subtext-color);
-        font-size: 0.9em;
-        margin-top: 0;
-    }
-    /* 사이드바 버튼 디자인 개선 */
-    [data-testid="stSidebar"] .stButton > button {
-        background-color: transparent !important;
-        border: none !important;
-        color: var(--text-color) !important;
-        text-align: left;
-        padding: 12px 10px;
-        margin: 5px 0;
-        transition: all 0.2s;
-    }
-    [data-testid="stSidebar"] .stButton > button:hover {
-        background-color: var(--accent-light-color) !important;
-        color: var(--text-color) !important;
-        border-left: 5px solid var(--accent-color) !important;
-    }
-    [data-testid="stSidebar"] .stButton > button:focus {
-        box-shadow: none !important;
-    }
-    /* 체크리스트 아이템 정렬 */
-    div.st-emotion-cache-121p653 > p {
-        flex-grow: 1;
-        margin: 0;
-    }
-</style>
-""", unsafe_allow_html=True)
+# CSS 스타일 - static/styles.css 에서 한 번만 읽어온다
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "styles.css")
+
+@st.cache_resource
+def load_css():
+    """스타일시트를 <style> 태그 문자열로 반환 (프로세스당 한 번 읽어 모든 세션이 같은 문자열을 공유)"""
+    with open(CSS_PATH, 'r', encoding='utf-8') as f:
+        return f"<style>\n{f.read()}</style>"
 
-# 데이터베이스 연결 초기화 함수
-def init_connection():
+st.markdown(load_css(), unsafe_allow_html=True)
+
+# 자주 호출되는 일정 쿼리 - 커넥션마다 한 번만 PREPARE 하고 이후에는 EXECUTE로 재사용
+PREPARED_STATEMENTS = {
+    # 권장 인덱스: CREATE INDEX idx_user_schedule_user_date_time ON user_schedule(user_id, scheduled_date, scheduled_time)
+    #            (ORDER BY와 같은 순서라 정렬 단계 없이 인덱스 순서대로 읽음)
+    "fetch_schedules": """
+        SELECT id, title, scheduled_date, scheduled_time, status, 
+               category, description, priority, created_at, updated_at
+        FROM user_schedule 
+        WHERE user_id = $1 
+        ORDER BY scheduled_date ASC, scheduled_time ASC
+    """,
+    "add_schedule": """
+        INSERT INTO user_schedule 
+        (user_id, title, scheduled_date, scheduled_time, status, category, description, priority)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        RETURNING id
+    """,
+    "update_schedule_status": """
+        UPDATE user_schedule 
+        SET status = $1, updated_at = NOW()
+        WHERE id = $2
+        RETURNING title
+    """,
+    # 권장 인덱스: CREATE INDEX idx_user_schedule_user_date ON user_schedule(user_id, scheduled_date)
+    #            WHERE status IN ('pending', 'in_progress')
+    "fetch_next_event": """
+        SELECT id, title, scheduled_date, scheduled_time, status, category, description, priority
+        FROM user_schedule 
+        WHERE user_id = $1 
+          AND status IN ('pending', 'in_progress') 
+          AND scheduled_date >= CURRENT_DATE
+        ORDER BY scheduled_date ASC, scheduled_time ASC
+        LIMIT 1
+    """,
+    "delete_schedule": "DELETE FROM user_schedule WHERE id = $1 RETURNING title",
+}
+
+class PreparedConnection(PgConnection):
+    """PREPARE 실행 여부를 기억하는 커넥션"""
+    prepared = False
+
+def prepare_statements(conn):
+    """PREPARED_STATEMENTS를 커넥션에 등록 (실패하면 다음 대여 때 다시 시도, 커넥션을 못 쓰게 되면 False)"""
     try:
-        return psycopg2.connect(
-            host=st.secrets["postgres"]["host"],
-            port=st.secrets["postgres"]["port"], 
-            database=st.secrets["postgres"]["database"],
-            user=st.secrets["postgres"]["user"],
-            password=st.secrets["postgres"]["password"]
-        )
+        with conn.cursor() as cur:
+            for name, sql in PREPARED_STATEMENTS.items():
+                cur.execute(f"PREPARE {name} AS {sql}")
+        conn.commit()
+        conn.prepared = True
+    except Exception as e:
+        print(f"[ERROR] PREPARE 실패: {e}")
+        # 연결이 끊긴 경우 롤백도 InterfaceError/OperationalError로 실패함
+        try:
+            conn.rollback()
+        except Exception as rollback_error:
+            print(f"[ERROR] PREPARE 롤백 실패: {rollback_error}")
+            return False
+    return True
+
+# 데이터베이스 커넥션 풀 (프로세스당 한 번 생성, 재실행/세션 간 공유)
+@st.cache_resource
+def get_pool():
+    return ThreadedConnectionPool(
+        1, 10,
+        host=st.secrets["postgres"]["host"],
+        port=st.secrets["postgres"]["port"], 
+        database=st.secrets["postgres"]["database"],
+        user=st.secrets["postgres"]["user"],
+        password=st.secrets["postgres"]["password"],
+        # 풀에 오래 머무는 유휴 연결이 NAT/방화벽에서 끊기지 않도록 TCP keepalive 사용
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+        connection_factory=PreparedConnection
+    )
+
+# 풀에서 커넥션을 빌려주고 블록이 끝나면 반납 (연결 실패 시 None)
+@contextmanager
+def get_conn():
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
     except Exception as e:
         st.error(f"데이터베이스 연결 실패: {e}")
-        return None
+        yield None
+        return
+    
+    if not conn.prepared and not prepare_statements(conn):
+        # 롤백까지 실패한 커넥션은 풀에 돌려보내지 않고 닫음 (다음 대여 때 새로 연결)
+        pool.putconn(conn, close=True)
+        st.error("데이터베이스 연결 실패: 커넥션이 끊어졌습니다")
+        yield None
+        return
+    
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
 
 # --- DB 연동 함수들 (user_schedule 테이블) ---
 
+# 일정 조회 결과 컬럼 (조회 실패 시 빈 DataFrame에도 같은 컬럼을 유지)
+SCHEDULE_COLUMNS = [
+    'id', 'title', 'scheduled_date', 'scheduled_time', 'status',
+    'category', 'description', 'priority', 'created_at', 'updated_at'
+]
+
+# 날짜 컬럼별 표시 포맷 (컬럼 단위로 한 번에 변환)
+SCHEDULE_DATE_FORMATS = {
+    'scheduled_date': '%Y-%m-%d',
+    'created_at': '%Y-%m-%d %H:%M:%S',
+    'updated_at': '%Y-%m-%d %H:%M:%S',
+}
+
 # 사용자 일정을 DB에서 가져오는 함수
 @st.cache_data(ttl=60)  # 1분간 캐시 (실시간성을 위해 짧게)
 def fetch_schedule_from_db():
-    """user_schedule 테이블에서 일정 데이터 조회"""
+    """user_schedule 테이블에서 일정 데이터를 DataFrame으로 조회"""
     user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
-    conn = init_connection()
     
-    if conn is None:
-        # DB 연결 실패 시 빈 목록 반환
-        return []
-    
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, title, scheduled_date, scheduled_time, status, 
-                       category, description, priority, created_at, updated_at
-                FROM user_schedule 
-                WHERE user_id = %s 
-                ORDER BY scheduled_date ASC, scheduled_time ASC
-            """, (user_id,))
+    with get_conn() as conn:
+        if conn is None:
+            # DB 연결 실패 시 빈 목록 반환
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE fetch_schedules (%s)", (user_id,))
+                
+                columns = [desc[0] for desc in cur.description]
+                df = pd.DataFrame.from_records(cur.fetchall(), columns=columns)
             
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]
+            # 날짜/시간 포맷팅 (행 단위 strftime 대신 컬럼 단위 변환, 값이 없으면 None 유지)
+            for col, fmt in SCHEDULE_DATE_FORMATS.items():
+                dates = pd.to_datetime(df[col])
+                df[col] = dates.dt.strftime(fmt).astype(object).where(dates.notna(), None)
+            df['scheduled_time'] = df['scheduled_time'].map(lambda t: t.strftime('%H:%M'), na_action='ignore')
             
-            schedules = []
-            for row in rows:
-                schedule_dict = dict(zip(columns, row))
+            return df
+                
+        except Exception as e:
+            st.error(f"일정 조회 중 오류: {e}")
+            return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+
+# 다음 예정 일정 1건만 DB에서 가져오는 함수 (필터링/정렬은 SQL에서 처리)
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_next_event_from_db():
+    """pending/in_progress 상태의 오늘 이후 일정 중 가장 빠른 일정 조회"""
+    user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
+    
+    with get_conn() as conn:
+        if conn is None:
+            return None
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE fetch_next_event (%s)", (user_id,))
+                
+                row = cur.fetchone()
+                if row is None:
+                    return None
+                
+                columns = [desc[0] for desc in cur.description]
+                event = dict(zip(columns, row))
                 
                 # 날짜/시간 포맷팅
-                if schedule_dict['scheduled_date']:
-                    schedule_dict['scheduled_date'] = schedule_dict['scheduled_date'].strftime('%Y-%m-%d')
-                if schedule_dict['scheduled_time']:
-                    schedule_dict['scheduled_time'] = schedule_dict['scheduled_time'].strftime('%H:%M')
-                if schedule_dict['created_at']:
-                    schedule_dict['created_at'] = schedule_dict['created_at'].strftime('%Y-%m-%d %H:%M:%S')
-                if schedule_dict['updated_at']:
-                    schedule_dict['updated_at'] = schedule_dict['updated_at'].strftime('%Y-%m-%d %H:%M:%S')
+                event['scheduled_date'] = event['scheduled_date'].strftime('%Y-%m-%d')
+                if event['scheduled_time']:
+                    event['scheduled_time'] = event['scheduled_time'].strftime('%H:%M')
+                event['date'] = event['scheduled_date']  # 기존 코드 호환성을 위해
                 
-                schedules.append(schedule_dict)
-            
-            return schedules
-            
-    except Exception as e:
-        st.error(f"일정 조회 중 오류: {e}")
-        return []
-    finally:
-        conn.close()
+                return event
+                
+        except Exception as e:
+            print(f"다음 이벤트 조회 오류: {e}")
+            return None
 
 # 새 일정을 DB에 추가하는 함수
 def add_schedule_to_db(title, scheduled_date, scheduled_time=None, category="general", description="", priority="medium", status="pending"):
     """user_schedule 테이블에 새 일정 추가"""
     user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
-    conn = init_connection()
     
-    if conn is None:
-        return False, "데이터베이스 연결 실패"
-    
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO user_schedule 
-                (user_id, title, scheduled_date, scheduled_time, status, category, description, priority)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (user_id, title, scheduled_date, scheduled_time, status, category, description, priority))
-            
-            new_id = cur.fetchone()[0]
-            conn.commit()
-            
-            # 캐시 무효화
-            fetch_schedule_from_db.clear()
-            
-            return True, f"일정이 추가되었습니다 (ID: {new_id})"
-            
-    except Exception as e:
-        conn.rollback()
-        return False, f"일정 추가 실패: {e}"
-    finally:
-        conn.close()
+    with get_conn() as conn:
+        if conn is None:
+            return False, "데이터베이스 연결 실패"
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "EXECUTE add_schedule (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    (user_id, title, scheduled_date, scheduled_time, status, category, description, priority)
+                )
+                
+                new_id = cur.fetchone()[0]
+                conn.commit()
+                
+                # 캐시 무효화
+                fetch_schedule_from_db.clear()
+                fetch_next_event_from_db.clear()
+                
+                return True, f"일정이 추가되었습니다 (ID: {new_id})"
+                
+        except Exception as e:
+            conn.rollback()
+            return False, f"일정 추가 실패: {e}"
 
 # 일정 상태 업데이트 함수
 def update_schedule_status(schedule_id, new_status):
     """일정 상태 업데이트 (pending, in_progress, completed, cancelled)"""
-    conn = init_connection()
-    
-    if conn is None:
-        return False, "데이터베이스 연결 실패"
-    
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE user_schedule 
-                SET status = %s, updated_at = NOW()
-                WHERE id = %s
-                RETURNING title
-            """, (new_status, schedule_id))
-            
-            result = cur.fetchone()
-            if result:
+    with get_conn() as conn:
+        if conn is None:
+            return False, "데이터베이스 연결 실패"
+        
+        try:
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE update_schedule_status (%s, %s)", (new_status, schedule_id))
+                
+                result = cur.fetchone()
+                if result:
+                    title = result[0]
+                    conn.commit()
+                    
+                    # 캐시 무효화
+                    fetch_schedule_from_db.clear()
+                    fetch_next_event_from_db.clear()
+                    
+                    return True, f"'{title}' 상태가 '{new_status}'로 변경되었습니다"
+                else:
+                    return False, "일정을 찾을 수 없습니다"
+                    
+        except Exception as e:
+            conn.rollback()
+            return False, f"상태 업데이트 실패: {e}"
+
+# 일정 삭제 함수
+def delete_schedule_from_db(schedule_id):
+    """일정 삭제"""
+    with get_conn() as conn:
+        if conn is None:
+            return False, "데이터베이스 연결 실패"
+        
+        try:
+            with conn.cursor() as cur:
+                # 일정 삭제 (삭제된 일정 제목을 RETURNING으로 함께 받아 한 번에 처리)
+                cur.execute("EXECUTE delete_schedule (%s)", (schedule_id,))
+                result = cur.fetchone()
+                
+                if not result:
+                    return False, "일정을 찾을 수 없습니다"
+                
                 title = result[0]
                 conn.commit()
                 
                 # 캐시 무효화
                 fetch_schedule_from_db.clear()
+                fetch_next_event_from_db.clear()
                 
-                return True, f"'{title}' 상태가 '{new_status}'로 변경되었습니다"
-            else:
-                return False, "일정을 찾을 수 없습니다"
+                return True, f"'{title}' 일정이 삭제되었습니다"
                 
-    except Exception as e:
-        conn.rollback()
-        return False, f"상태 업데이트 실패: {e}"
-    finally:
-        conn.close()
+        except Exception as e:
+            conn.rollback()
+            return False, f"일정 삭제 실패: {e}"
 
-# 일정 삭제 함수
-def delete_schedule_from_db(schedule_id):
-    """일정 삭제"""
-    conn = init_connection()
-    
-    if conn is None:
-        return False, "데이터베이스 연결 실패"
-    
-    try:
-        with conn.cursor() as cur:
-            # 먼저 제목 조회
-            cur.execute("SELECT title FROM user_schedule WHERE id = %s", (schedule_id,))
-            result = cur.fetchone()
-            
-            if not result:
-                return False, "일정을 찾을 수 없습니다"
-            
-            title = result[0]
-            
-            # 일정 삭제
-            cur.execute("DELETE FROM user_schedule WHERE id = %s", (schedule_id,))
-            conn.commit()
-            
-            # 캐시 무효화
-            fetch_schedule_from_db.clear()
-            
-            return True, f"'{title}' 일정이 삭제되었습니다"
-            
-    except Exception as e:
-        conn.rollback()
-        return False, f"일정 삭제 실패: {e}"
-    finally:
-        conn.close()
+# 업체 테이블명 → 화면에 표시할 카테고리명
+TABLE_MAP = {
+    'wedding_hall': '웨딩홀',
+    'studio': '스튜디오',
+    'wedding_dress': '드레스',
+    'makeup': '메이크업'
+}
 
-# 데이터베이스에서 업체 정보를 가져오는 함수
-@st.cache_data(ttl=600)
-def fetch_vendors_from_db():
-    table_map = {
-        'wedding_hall': '웨딩홀',
-        'studio': '스튜디오',
-        'wedding_dress': '드레스',
-        'makeup': '메이크업'
-    }
-    
-    all_vendors = []
-    conn = init_connection()
-    
-    if conn is None:
-        return [
-            {
-                'id': 1,
-                'name': '샘플 웨딩홀',
-                'type': '웨딩홀', 
-                'description': '데이터베이스 연결 중 문제가 발생했습니다.',
-                'rating': 4.5,
-                'reviews': 100,
-                'price': '문의',
-                'image': '🏢'
-            }
-        ]
+# 검색 화면 카테고리 옵션 (TABLE_MAP에서 한 번만 만들어 재사용)
+CATEGORIES = ('전체',) + tuple(TABLE_MAP.values())
+
+# 업체 테이블별 최저가 컬럼 (studio 테이블에는 min_fee가 없고 std_price를 사용)
+PRICE_COLUMNS = {
+    'wedding_hall': 'min_fee',
+    'studio': 'std_price',
+    'wedding_dress': 'min_fee',
+    'makeup': 'min_fee'
+}
+
+# 4개 업체 테이블을 공통 컬럼으로 맞춰 한 번의 UNION ALL 쿼리로 조회
+# 화면에서 쓰는 키 이름(name, price, type ...)은 SQL 별칭으로 맞춰 행을 그대로 사용
+# 평점/리뷰 수는 업체명 해시로 SQL에서 계산 (조회할 때마다 값이 바뀌지 않도록)
+VENDORS_SQL = "\nUNION ALL\n".join(
+    f"""SELECT conm AS id, conm AS name, '{category}' AS type, {PRICE_COLUMNS[table_name]} AS price, subway,
+       round((4.0 + (hashtext(conm) & 1023) / 1023.0)::numeric, 1)::float8 AS rating,
+       50 + abs(mod(hashtext(conm), 450)) AS reviews,
+       '간단한 업체 설명입니다.' AS description, '🏢' AS image
+FROM {table_name}"""
+    for table_name, category in TABLE_MAP.items()
+)
+
+# 카테고리/검색어 필터와 LIMIT을 DB에서 처리 (조건은 UNION ALL 각 테이블 조회로 내려가 적용됨)
+# 권장 인덱스 (업체명/지하철역 부분 검색용, 4개 업체 테이블 각각):
+#   CREATE EXTENSION IF NOT EXISTS pg_trgm;
+#   CREATE INDEX idx_wedding_hall_conm_trgm ON wedding_hall USING gin (conm gin_trgm_ops);
+#   CREATE INDEX idx_wedding_hall_subway_trgm ON wedding_hall USING gin (subway gin_trgm_ops);
+VENDOR_SEARCH_SQL = f"""SELECT * FROM (
+{VENDORS_SQL}
+) AS vendors
+WHERE (%(category)s IS NULL OR type = %(category)s)
+  AND (%(pattern)s IS NULL OR name ILIKE %(pattern)s OR subway ILIKE %(pattern)s)
+LIMIT %(limit)s"""
+
+# 검색 결과 최대 개수
+VENDOR_SEARCH_LIMIT = 50
+
+# DB 연결 실패 시 보여줄 샘플 업체
+SAMPLE_VENDORS = (
+    MappingProxyType({
+        'id': 1,
+        'name': '샘플 웨딩홀',
+        'type': '웨딩홀', 
+        'description': '데이터베이스 연결 중 문제가 발생했습니다.',
+        'rating': 4.5,
+        'reviews': 100,
+        'price': '문의',
+        'image': '🏢'
+    }),
+)
+
+def _like_pattern(query):
+    """검색어를 ILIKE 부분 일치 패턴으로 변환 (%, _ 는 문자 그대로 검색)"""
+    escaped = query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
 
+# 업체 목록 조회 - (카테고리, 검색어, 개수) 조합별로 캐시하고 모든 세션이 같은 객체를 공유하므로
+# 읽기 전용(tuple + MappingProxyType)으로 반환
+# 예외는 캐시되지 않으므로 연결/조회 실패는 예외로 올려 보낸다
+@st.cache_resource(ttl=3600, max_entries=256, show_spinner=False)
+def load_vendors(category, query, limit):
+    with get_conn() as conn:
+        if conn is None:
+            raise ConnectionError("데이터베이스 연결 실패")
+
+        params = {
+            'category': None if category == '전체' else category,
+            'pattern': _like_pattern(query) if query else None,
+            'limit': limit,
+        }
+        # RealDictCursor: 행을 dict로 바로 받아 컬럼명 매핑/키 변경 없이 사용
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(VENDOR_SEARCH_SQL, params)
+            return tuple(MappingProxyType(row) for row in cur.fetchall())
+
+# 찜 목록 키 - 업체명이 같아도 카테고리가 다르면 다른 업체로 구분
+def vendor_key(vendor):
+    return f"{vendor['type']}:{vendor['id']}"
+
+# 데이터베이스에서 업체 정보를 가져오는 함수
+def fetch_vendors_from_db(category='전체', query='', limit=VENDOR_SEARCH_LIMIT):
     try:
-        with conn.cursor() as cur:
-            for table_name, type_name in table_map.items():
-                try:
-                    cur.execute(f"SELECT * FROM {table_name};")
-                    
-                    rows = cur.fetchall()
-                    columns = [desc[0] for desc in cur.description]
-                    
-                    for row in rows:
-                        vendor_dict = dict(zip(columns, row))
-                        vendor_dict['type'] = type_name 
-                        
-                        if 'conm' in vendor_dict:
-                            vendor_dict['name'] = vendor_dict.pop('conm')
-                            vendor_dict['id'] = vendor_dict['name']
-                        
-                        if 'min_fee' in vendor_dict:
-                            vendor_dict['price'] = vendor_dict.pop('min_fee')
-                        
-                        vendor_dict['description'] = "간단한 업체 설명입니다."
-                        vendor_dict['rating'] = random.uniform(4.0, 5.0)
-                        vendor_dict['reviews'] = random.randint(50, 500)
-                        vendor_dict['image'] = '🏢'
-                        
-                        all_vendors.append(vendor_dict)
-                        
-                except Exception as table_error:
-                    st.warning(f"{table_name} 테이블 조회 실패: {table_error}")
-                    continue
-                    
+        return load_vendors(category, query.strip(), limit)
+    except ConnectionError:
+        return SAMPLE_VENDORS
     except Exception as e:
         st.error(f"데이터베이스 조회 중 오류: {e}")
-        return []
-    finally:
-        conn.close()
-        
-    return all_vendors
+        return ()
 
 # --- 기존 데이터 (예산만 유지) ---
 budget_categories = [
@@ -364,53 +406,36 @@ budget_categories = [
     { "name": "드레스", "budget": 200, "spent": 150, "color": "#FF6B6B" },
 ]
 
+# 예산 합계/카테고리별 사용률 계산 (재실행마다 다시 계산하지 않도록 캐시)
+@st.cache_data(show_spinner=False)
+def summarize_budget(categories):
+    """(이름, 예산, 사용액) 튜플들을 받아 (총 예산, 총 사용액, 카테고리별 (이름, 사용액, 예산, 사용률)) 반환"""
+    total_budget = sum(budget for _, budget, _ in categories)
+    total_spent = sum(spent for _, _, spent in categories)
+    rows = tuple((name, spent, budget, spent / budget) for name, budget, spent in categories)
+    return total_budget, total_spent, rows
+
+def get_budget_summary():
+    return summarize_budget(tuple((c['name'], c['budget'], c['spent']) for c in budget_categories))
+
 # --- 유틸리티 함수 ---
 def calculate_dday(wedding_date_str):
-    today = datetime.now().date()
-    wedding_date = datetime.strptime(wedding_date_str, "%Y-%m-%d").date()
+    today = date.today()
+    wedding_date = date.fromisoformat(wedding_date_str)
     delta = wedding_date - today
     return delta.days if delta.days > 0 else 0
 
 def get_next_event():
     """DB에서 가져온 일정 중 다음 예정 이벤트 반환"""
-    try:
-        schedules = fetch_schedule_from_db()
-        if not schedules:
-            return None
-            
-        # pending 또는 in_progress 상태이고 날짜가 있는 일정들만 필터링
-        upcoming = []
-        today = datetime.now().date()
-        
-        for item in schedules:
-            if item['status'] in ['pending', 'in_progress'] and item['scheduled_date']:
-                try:
-                    # scheduled_date가 문자열인 경우 datetime으로 변환
-                    if isinstance(item['scheduled_date'], str):
-                        schedule_date = datetime.strptime(item['scheduled_date'], "%Y-%m-%d").date()
-                    else:
-                        schedule_date = item['scheduled_date']
-                    
-                    # 오늘 이후의 일정만 포함
-                    if schedule_date >= today:
-                        item['date'] = item['scheduled_date']  # 기존 코드 호환성을 위해
-                        upcoming.append(item)
-                except (ValueError, TypeError):
-                    continue
-        
-        if not upcoming:
-            return None
-            
-        # 날짜순으로 정렬
-        upcoming.sort(key=lambda x: datetime.strptime(x['scheduled_date'], "%Y-%m-%d"))
-        return upcoming[0]
-        
-    except Exception as e:
-        print(f"다음 이벤트 조회 오류: {e}")
-        return None
+    return fetch_next_event_from_db()
 
 def donut_chart_svg(percentage, color, radius=50, stroke_width=10):
-    circumference = 2 * 3.14159 * radius
+    # 퍼센트를 정수로 맞춰 캐시 적중률을 높임 (표시 값도 정수로 반올림해 보여줌)
+    return _donut_chart_svg(round(percentage), color, radius, stroke_width)
+
+@lru_cache(maxsize=128)
+def _donut_chart_svg(percentage, color, radius, stroke_width):
+    circumference = math.tau * radius
     offset = circumference - (percentage / 100) * circumference
     return f"""
     <div style="position: relative; width: {radius*2+stroke_width}px; height: {radius*2+stroke_width}px;">
@@ -419,7 +444,7 @@ def donut_chart_svg(percentage, color, radius=50, stroke_width=10):
             <circle cx="{radius+stroke_width/2}" cy="{radius+stroke_width/2}" r="{radius}" fill="none" stroke="{color}" stroke-width="{stroke_width}" stroke-dasharray="{circumference}" stroke-dashoffset="{offset}" stroke-linecap="round"></circle>
         </svg>
         <div class="donut-chart-text">
-            <span class="donut-chart-percentage">{round(percentage)}%</span>
+            <span class="donut-chart-percentage">{percentage}%</span>
             <div class="donut-chart-label">사용</div>
         </div>
     </div>
@@ -455,7 +480,7 @@ if 'checklist_items' not in st.session_state:
         {"item": "스튜디오 촬영 컨셉 확정", "checked": False},
     ]
 if 'liked_vendors' not in st.session_state:
-    st.session_state.liked_vendors = []
+    st.session_state.liked_vendors = {}  # vendor_key(업체) → 업체 정보 (찜한 순서 유지)
 
 # --- 사이드바 내비게이션 함수 ---
 def create_sidebar():
@@ -491,17 +516,30 @@ def create_sidebar():
         )
         st.markdown("---")
         
-        # 체크리스트 기능
+        # 체크리스트 기능 (체크/삭제 표시는 폼에 모아두고 '저장' 시 한 번에 반영)
         st.markdown("### ✅ 결혼 준비 체크리스트")
-        for i, item in enumerate(st.session_state.checklist_items):
-            cols = st.columns([0.8, 0.1, 0.1])
-            with cols[0]:
-                checked = st.checkbox(item["item"], value=item["checked"], key=f"check_{i}")
-                st.session_state.checklist_items[i]["checked"] = checked
-            with cols[1]:
-                if st.button("✖️", key=f"delete_check_{i}"):
-                    st.session_state.checklist_items.pop(i)
-                    st.rerun()
+        with st.form("checklist_form"):
+            for i, item in enumerate(st.session_state.checklist_items):
+                cols = st.columns([0.75, 0.25])
+                with cols[0]:
+                    st.checkbox(item["item"], value=item["checked"], key=f"check_{i}")
+                with cols[1]:
+                    st.checkbox("✖️", key=f"delete_check_{i}", help="저장 시 삭제")
+            submitted = st.form_submit_button("저장")
+        
+        if submitted:
+            items = st.session_state.checklist_items
+            for i, item in enumerate(items):
+                item["checked"] = st.session_state[f"check_{i}"]
+            st.session_state.checklist_items = [
+                item for i, item in enumerate(items)
+                if not st.session_state[f"delete_check_{i}"]
+            ]
+            # 인덱스 기반 위젯 키 초기화 (삭제로 항목이 밀려도 이전 체크 상태가 섞이지 않도록)
+            for i in range(len(items)):
+                del st.session_state[f"check_{i}"]
+                del st.session_state[f"delete_check_{i}"]
+            st.rerun()
         
         new_item = st.text_input("새 항목 추가", key="new_checklist_item")
         if new_item:
@@ -560,8 +598,7 @@ def render_home():
 
     col1, col2 = st.columns(2)
     with col1:
-        total_budget = sum(c['budget'] for c in budget_categories)
-        total_spent = sum(c['spent'] for c in budget_categories)
+        total_budget, total_spent, _ = get_budget_summary()
         budget_percentage = (total_spent / total_budget) * 100
         with st.container():
             st.markdown('<div class="card">', unsafe_allow_html=True)
@@ -579,12 +616,12 @@ def render_home():
             st.progress(60)
             st.markdown('</div>', unsafe_allow_html=True)
             
-    all_vendors = fetch_vendors_from_db()
+    recommended_vendors = fetch_vendors_from_db(limit=3)
 
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### ✨ AI 추천 업체")
-        for vendor in all_vendors[:3]: 
+        for vendor in recommended_vendors: 
             col1, col2 = st.columns([1, 4])
             with col1:
                 st.markdown(f"<div style='font-size: 2.5em; text-align: center;'>{vendor['image']}</div>", unsafe_allow_html=True)
@@ -598,32 +635,21 @@ def render_home():
 def render_search():
     st.markdown("<h2 style='text-align: center; color: var(--text-color);'>🔍 AI 추천 업체 찾기</h2>", unsafe_allow_html=True)
     
-    all_vendors = fetch_vendors_from_db()
-    
-    categories_order = ['전체', '웨딩홀', '스튜디오', '드레스', '메이크업']
-    db_categories = sorted(list(set(v['type'] for v in all_vendors)))
-    ordered_categories = [c for c in categories_order if c in ['전체'] + db_categories]
-    
-    selected_category = st.selectbox("카테고리 선택", options=ordered_categories)
+    selected_category = st.selectbox("카테고리 선택", options=CATEGORIES)
     search_query = st.text_input("업체명이나 지하철역으로 검색", placeholder="예: 더채플, 압구정로데오역")
     
     st.markdown("---")
 
-    filtered = all_vendors
-    if selected_category != '전체':
-        filtered = [v for v in filtered if v['type'] == selected_category]
-    if search_query:
-        filtered = [v for v in filtered if (
-            search_query.lower() in v['name'].lower() or 
-            (v.get('subway') and search_query.lower() in v['subway'].lower())
-        )]
+    # 카테고리/검색어 필터링은 DB에서 처리
+    filtered = fetch_vendors_from_db(selected_category, search_query)
     
     if not filtered:
         st.info("조건에 맞는 업체 정보가 없습니다.")
     
     def handle_like_button(vendor_info):
-        if vendor_info not in st.session_state.liked_vendors:
-            st.session_state.liked_vendors.append(vendor_info)
+        key = vendor_key(vendor_info)
+        if key not in st.session_state.liked_vendors:
+            st.session_state.liked_vendors[key] = vendor_info
             st.toast(f"❤️ {vendor_info['name']}이(가) 찜 목록에 추가되었습니다!")
 
     for i, vendor in enumerate(filtered):
@@ -683,9 +709,54 @@ def render_search():
                 st.button("🤍 찜하기", key=f"like_{i}_{vendor.get('id', vendor['name'])}", on_click=handle_like_button, args=(vendor,))
             st.markdown('</div>', unsafe_allow_html=True)
 
+# 일정 버튼 콜백 - 처리 결과는 _flash에 담아 다음 렌더링 때 한 번 표시
+def _on_status_change(schedule_id, new_status, level):
+    success, message = update_schedule_status(schedule_id, new_status)
+    st.session_state._flash = (level if success else 'error', message)
+
+def _on_delete_schedule(schedule_id):
+    success, message = delete_schedule_from_db(schedule_id)
+    st.session_state._flash = ('success' if success else 'error', message)
+
+def _on_add_schedule():
+    title = st.session_state.new_schedule_title.strip()
+    if not title:
+        st.session_state._flash = ('error', "일정 제목을 입력해주세요.")
+        return
+    
+    # 시간이 선택되지 않았으면 None으로 처리
+    scheduled_time = st.session_state.new_schedule_time
+    time_str = scheduled_time.strftime('%H:%M') if scheduled_time else None
+    
+    success, message = add_schedule_to_db(
+        title=title,
+        scheduled_date=st.session_state.new_schedule_date.strftime('%Y-%m-%d'),
+        scheduled_time=time_str,
+        category=st.session_state.new_schedule_category,
+        description=st.session_state.new_schedule_description.strip(),
+        priority=st.session_state.new_schedule_priority,
+        status="pending"
+    )
+    
+    if success:
+        st.session_state._flash = ('success', message)
+        st.balloons()  # 축하 효과
+        # 폼 입력값 초기화
+        st.session_state.new_schedule_title = ""
+        st.session_state.new_schedule_time = None
+        st.session_state.new_schedule_description = ""
+    else:
+        st.session_state._flash = ('error', message)
+
 def render_timeline():
     st.markdown("<h2 style='text-align: center; color: var(--text-color);'>🗓️ 결혼 준비 타임라인</h2>", unsafe_allow_html=True)
     
+    # 직전 버튼 처리 결과 표시
+    flash = st.session_state.pop('_flash', None)
+    if flash:
+        level, message = flash
+        getattr(st, level)(message)
+    
     # 탭으로 구분: 일정 보기 / 일정 추가
     tab1, tab2 = st.tabs(["📅 내 일정", "➕ 일정 추가"])
     
@@ -693,7 +764,7 @@ def render_timeline():
         # 일정 목록 표시
         schedules = fetch_schedule_from_db()
         
-        if not schedules:
+        if schedules.empty:
             st.info("등록된 일정이 없습니다. '일정 추가' 탭에서 새로운 일정을 만들어보세요!")
             return
         
@@ -711,20 +782,22 @@ def render_timeline():
             show_cancelled = st.checkbox("❌ 취소", value=False)
         
         # 필터링된 일정들
-        filtered_schedules = []
-        status_filter = []
-        if show_pending: status_filter.append('pending')
-        if show_in_progress: status_filter.append('in_progress')
-        if show_completed: status_filter.append('completed')
-        if show_cancelled: status_filter.append('cancelled')
+        status_filter = frozenset(
+            status for status, show in (
+                ('pending', show_pending),
+                ('in_progress', show_in_progress),
+                ('completed', show_completed),
+                ('cancelled', show_cancelled),
+            ) if show
+        )
         
-        filtered_schedules = [s for s in schedules if s['status'] in status_filter]
+        filtered_schedules = schedules[schedules['status'].isin(status_filter)]
         
         st.markdown("---")
         st.markdown(f"### 📊 총 {len(filtered_schedules)}개의 일정")
         
         # 일정 카드들 표시
-        for i, schedule in enumerate(filtered_schedules):
+        for schedule in filtered_schedules.itertuples(index=False):
             with st.container():
                 st.markdown('<div class="card">', unsafe_allow_html=True)
                 
@@ -736,83 +809,59 @@ def render_timeline():
                     'cancelled': {'icon': '❌', 'color': '#FF3B30', 'label': '취소'}
                 }
                 
-                config = status_config.get(schedule['status'], status_config['pending'])
+                config = status_config.get(schedule.status, status_config['pending'])
                 
                 # 제목과 상태
-                st.markdown(f"<h4>{config['icon']} {schedule['title']}</h4>", unsafe_allow_html=True)
+                st.markdown(f"<h4>{config['icon']} {schedule.title}</h4>", unsafe_allow_html=True)
                 
                 # 세부 정보
                 info_cols = st.columns(3)
                 with info_cols[0]:
-                    if schedule['scheduled_date']:
-                        st.markdown(f"**📅 날짜:** {schedule['scheduled_date']}")
-                    if schedule['scheduled_time']:
-                        st.markdown(f"**🕐 시간:** {schedule['scheduled_time']}")
+                    if schedule.scheduled_date:
+                        st.markdown(f"**📅 날짜:** {schedule.scheduled_date}")
+                    if schedule.scheduled_time:
+                        st.markdown(f"**🕐 시간:** {schedule.scheduled_time}")
                 
                 with info_cols[1]:
-                    st.markdown(f"**📂 카테고리:** {schedule.get('category', '일반')}")
+                    st.markdown(f"**📂 카테고리:** {schedule.category or '일반'}")
                     priority_icons = {'high': '🔴', 'medium': '🟡', 'low': '🟢'}
-                    priority_icon = priority_icons.get(schedule.get('priority', 'medium'), '🟡')
-                    st.markdown(f"**{priority_icon} 우선순위:** {schedule.get('priority', 'medium')}")
+                    priority_icon = priority_icons.get(schedule.priority, '🟡')
+                    st.markdown(f"**{priority_icon} 우선순위:** {schedule.priority}")
                 
                 with info_cols[2]:
                     st.markdown(f"<span style='color: {config['color']}; font-weight: bold;'>● {config['label']}</span>", unsafe_allow_html=True)
                 
                 # 설명
-                if schedule.get('description'):
-                    st.markdown(f"**📝 설명:** {schedule['description']}")
+                if schedule.description:
+                    st.markdown(f"**📝 설명:** {schedule.description}")
                 
                 st.markdown("---")
                 
-                # 액션 버튼들
+                # 액션 버튼들 (on_click 콜백에서 처리 → 콜백 후 자동 재실행되므로 st.rerun 불필요)
                 action_cols = st.columns(4)
+                schedule_id = int(schedule.id)  # numpy 정수는 psycopg2가 바로 처리하지 못하므로 변환
                 
                 with action_cols[0]:
-                    if schedule['status'] == 'pending':
-                        if st.button("▶️ 시작", key=f"start_{schedule['id']}"):
-                            success, message = update_schedule_status(schedule['id'], 'in_progress')
-                            if success:
-                                st.success(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
-                    elif schedule['status'] == 'in_progress':
-                        if st.button("✅ 완료", key=f"complete_{schedule['id']}"):
-                            success, message = update_schedule_status(schedule['id'], 'completed')
-                            if success:
-                                st.success(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
+                    if schedule.status == 'pending':
+                        st.button("▶️ 시작", key=f"start_{schedule_id}",
+                                  on_click=_on_status_change, args=(schedule_id, 'in_progress', 'success'))
+                    elif schedule.status == 'in_progress':
+                        st.button("✅ 완료", key=f"complete_{schedule_id}",
+                                  on_click=_on_status_change, args=(schedule_id, 'completed', 'success'))
                 
                 with action_cols[1]:
-                    if schedule['status'] in ['pending', 'in_progress']:
-                        if st.button("❌ 취소", key=f"cancel_{schedule['id']}"):
-                            success, message = update_schedule_status(schedule['id'], 'cancelled')
-                            if success:
-                                st.warning(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
+                    if schedule.status in ['pending', 'in_progress']:
+                        st.button("❌ 취소", key=f"cancel_{schedule_id}",
+                                  on_click=_on_status_change, args=(schedule_id, 'cancelled', 'warning'))
                 
                 with action_cols[2]:
-                    if schedule['status'] == 'cancelled':
-                        if st.button("🔄 복원", key=f"restore_{schedule['id']}"):
-                            success, message = update_schedule_status(schedule['id'], 'pending')
-                            if success:
-                                st.info(message)
-                                st.rerun()
-                            else:
-                                st.error(message)
+                    if schedule.status == 'cancelled':
+                        st.button("🔄 복원", key=f"restore_{schedule_id}",
+                                  on_click=_on_status_change, args=(schedule_id, 'pending', 'info'))
                 
                 with action_cols[3]:
-                    if st.button("🗑️ 삭제", key=f"delete_{schedule['id']}"):
-                        success, message = delete_schedule_from_db(schedule['id'])
-                        if success:
-                            st.success(message)
-                            st.rerun()
-                        else:
-                            st.error(message)
+                    st.button("🗑️ 삭제", key=f"delete_{schedule_id}",
+                              on_click=_on_delete_schedule, args=(schedule_id,))
                 
                 st.markdown('</div>', unsafe_allow_html=True)
     
@@ -822,19 +871,19 @@ def render_timeline():
         
         with st.form("add_schedule_form"):
             # 기본 정보
-            title = st.text_input("📝 일정 제목 *", placeholder="예: 드레스샵 상담")
+            st.text_input("📝 일정 제목 *", placeholder="예: 드레스샵 상담", key="new_schedule_title")
             
             # 날짜 및 시간
             date_cols = st.columns(2)
             with date_cols[0]:
-                scheduled_date = st.date_input("📅 날짜 *", value=datetime.now().date())
+                st.date_input("📅 날짜 *", value=date.today(), key="new_schedule_date")
             with date_cols[1]:
-                scheduled_time = st.time_input("🕐 시간", value=None)
+                st.time_input("🕐 시간", value=None, key="new_schedule_time")
             
             # 카테고리 및 우선순위
             detail_cols = st.columns(2)
             with detail_cols[0]:
-                category = st.selectbox("📂 카테고리", 
+                st.selectbox("📂 카테고리", 
                     options=["general", "venue", "dress", "photo", "makeup", "catering", "decoration", "etc"],
                     format_func=lambda x: {
                         "general": "일반",
@@ -845,52 +894,27 @@ def render_timeline():
                         "catering": "케이터링",
                         "decoration": "장식",
                         "etc": "기타"
-                    }.get(x, x)
+                    }.get(x, x),
+                    key="new_schedule_category"
                 )
             
             with detail_cols[1]:
-                priority = st.selectbox("🎯 우선순위", 
+                st.selectbox("🎯 우선순위", 
                     options=["high", "medium", "low"],
                     index=1,  # medium이 기본값
-                    format_func=lambda x: {"high": "높음", "medium": "보통", "low": "낮음"}.get(x, x)
+                    format_func=lambda x: {"high": "높음", "medium": "보통", "low": "낮음"}.get(x, x),
+                    key="new_schedule_priority"
                 )
             
             # 설명
-            description = st.text_area("📝 설명", placeholder="일정에 대한 추가 설명을 입력하세요")
+            st.text_area("📝 설명", placeholder="일정에 대한 추가 설명을 입력하세요", key="new_schedule_description")
             
-            # 제출 버튼
-            submitted = st.form_submit_button("✅ 일정 추가", use_container_width=True)
-            
-            if submitted:
-                if not title.strip():
-                    st.error("일정 제목을 입력해주세요.")
-                else:
-                    # 시간이 선택되지 않았으면 None으로 처리
-                    time_str = scheduled_time.strftime('%H:%M') if scheduled_time else None
-                    
-                    success, message = add_schedule_to_db(
-                        title=title.strip(),
-                        scheduled_date=scheduled_date.strftime('%Y-%m-%d'),
-                        scheduled_time=time_str,
-                        category=category,
-                        description=description.strip(),
-                        priority=priority,
-                        status="pending"
-                    )
-                    
-                    if success:
-                        st.success(message)
-                        st.balloons()  # 축하 효과
-                        # 폼 리셋을 위해 페이지 새로고침
-                        time.sleep(1)
-                        st.rerun()
-                    else:
-                        st.error(message)
+            # 제출 버튼 (콜백에서 저장 → 콜백 후 한 번만 재실행되므로 sleep/st.rerun 불필요)
+            st.form_submit_button("✅ 일정 추가", use_container_width=True, on_click=_on_add_schedule)
 
 def render_budget():
     st.markdown("<h2 style='text-align: center; color: var(--text-color);'>💰 예산 관리</h2>", unsafe_allow_html=True)
-    total_budget = sum(c['budget'] for c in budget_categories)
-    total_spent = sum(c['spent'] for c in budget_categories)
+    total_budget, total_spent, category_rows = get_budget_summary()
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 전체 예산 현황")
@@ -902,68 +926,119 @@ def render_budget():
     with st.container():
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.markdown("### 카테고리별 예산")
-        for cat in budget_categories:
-            st.markdown(f"**{cat['name']}**")
-            st.markdown(f"<span style='color: var(--subtext-color);'>{cat['spent']:,}만원 / {cat['budget']:,}만원</span>", unsafe_allow_html=True)
-            st.progress(cat['spent'] / cat['budget'])
+        for name, spent, budget, ratio in category_rows:
+            st.markdown(f"**{name}**")
+            st.markdown(f"<span style='color: var(--subtext-color);'>{spent:,}만원 / {budget:,}만원</span>", unsafe_allow_html=True)
+            st.progress(ratio)
         st.markdown('</div>', unsafe_allow_html=True)
 
 def render_chat():
     st.markdown("<h2 style='text-align: center; color: var(--text-color);'>💬 AI 플래너 마리</h2>", unsafe_allow_html=True)
-    
-    # 첫 번째 메시지에 대한 버튼 옵션 정의
-    button_options = {
-        "📋 개인 정보 입력": "개인 정보(이름, 예식일, 예산 등)를 입력하고 싶어요.",
-        "🏃‍♀️ 준비 시간이 부족하고 너무 바빠요": "시간을 절약할 수 있는 효율적인 준비 방법을 추천해 주세요.",
-        "✨ 개성 있고 특별한 웨딩을 원해요": "트렌디하고 개성 있는 컨셉과 업체를 추천해 주세요.",
-        "💡 합리적이고 계획적인 소비가 목표예요": "가성비 좋은 웨딩홀과 업체를 찾고 예산 관리를 도와주세요.",
-        "😎 다 귀찮고 알잘딱깔센": "알아서 척척! 마리가 모든 것을 추천하고 계획해 주세요."
-    }
-    
+    render_chat_messages()
+
+# LangGraph 앱 (프로세스당 한 번 컴파일해 모든 세션이 공유)
+# 그래프/LLM 클라이언트 초기화를 첫 채팅 시점으로 미뤄 다른 페이지의 첫 로딩을 가볍게 함
+@st.cache_resource(show_spinner=False)
+def get_langgraph_app():
+    from graph import get_app
+    return get_app()
+
+# 그래프 노드가 async라 ainvoke로 실행 - 세션마다 asyncio.run으로 루프를 새로 만들면
+# LLM 클라이언트의 커넥션 풀이 닫힌 루프에 묶이므로, 백그라운드 스레드의 루프 하나를 공유
+@st.cache_resource(show_spinner=False)
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+def run_langgraph(state):
+    return asyncio.run_coroutine_threadsafe(get_langgraph_app().ainvoke(state), get_event_loop()).result()
+
+# 첫 번째 메시지에 대한 버튼 옵션 정의
+INTRO_BUTTON_OPTIONS = {
+    "📋 개인 정보 입력": "개인 정보(이름, 예식일, 예산 등)를 입력하고 싶어요.",
+    "🏃‍♀️ 준비 시간이 부족하고 너무 바빠요": "시간을 절약할 수 있는 효율적인 준비 방법을 추천해 주세요.",
+    "✨ 개성 있고 특별한 웨딩을 원해요": "트렌디하고 개성 있는 컨셉과 업체를 추천해 주세요.",
+    "💡 합리적이고 계획적인 소비가 목표예요": "가성비 좋은 웨딩홀과 업체를 찾고 예산 관리를 도와주세요.",
+    "😎 다 귀찮고 알잘딱깔센": "알아서 척척! 마리가 모든 것을 추천하고 계획해 주세요."
+}
+INTRO_PROMPTS = frozenset(INTRO_BUTTON_OPTIONS.values())
+
+# 인트로 버튼 첫 응답 캐시 - (대화 내용, 세션 메모, 메모 파일 버전)이 같으면 LLM 호출 없이 이전 결과 재사용
+# 그래프는 memo_check_node에서 메모 파일을 읽어 쓰므로 파일 mtime도 키에 포함 (파일이 바뀌면 캐시 미스)
+# 일정 추가 등 부수효과가 있는 일반 대화는 캐시하지 않고 인트로 첫 턴에만 사용
+@st.cache_data(ttl=3600, max_entries=100, show_spinner=False)
+def invoke_intro_prompt(history, memo_json, memo_version):
+    messages = [AIMessage(content=content) if msg_type == "ai" else HumanMessage(content=content)
+                for msg_type, content in history]
+    result = run_langgraph(State(
+        messages=messages,
+        memo=json.loads(memo_json),
+        intent="",
+        tools_needed=[],
+        tool_results={}
+    ))
+    return {"messages": result["messages"], "memo": result["memo"]}
+
+# 채팅 영역만 다시 실행되는 fragment (메시지 전송 시 사이드바/다른 페이지는 다시 그리지 않음)
+@st.fragment
+def render_chat_messages():
     def handle_intro_button_click(prompt_content):
         st.session_state.messages.append(HumanMessage(content=prompt_content))
 
-    # 메시지 렌더링 및 버튼 표시
-    for i, msg in enumerate(st.session_state.messages):
+    # 메시지 렌더링
+    messages = st.session_state.messages
+    intro_bubble = None
+    for i, msg in enumerate(messages):
         role = "assistant" if isinstance(msg, AIMessage) else "user"
-        with st.chat_message(role):
-            st.write(msg.content)
-            
-            # 첫 번째 AIMessage (인트로 메시지) 바로 아래에만 버튼을 표시
-            if i == 0 and role == "assistant":
-                col1, col2, col3 = st.columns([1, 1, 1])
-                cols = [col1, col2, col3, col1, col2] # 5개의 버튼을 3열로 배치
+        bubble = st.chat_message(role)
+        bubble.write(msg.content)
+        if i == 0 and role == "assistant":
+            intro_bubble = bubble
+    
+    # 첫 번째 AIMessage (인트로 메시지) 말풍선 아래에 시작 버튼 표시 (루프 밖에서 한 번만 구성)
+    if intro_bubble is not None:
+        with intro_bubble:
+            col1, col2, col3 = st.columns([1, 1, 1])
+            cols = [col1, col2, col3, col1, col2] # 5개의 버튼을 3열로 배치
 
-                st.markdown("어떤 방식으로 시작해볼까요?") 
-                
-                for j, (btn_label, prompt_content) in enumerate(button_options.items()):
-                    with cols[j]:
-                        st.button(
-                            btn_label, 
-                            key=f"chat_intro_btn_{j}",
-                            on_click=handle_intro_button_click,
-                            args=(prompt_content,)
-                        )
+            st.markdown("어떤 방식으로 시작해볼까요?") 
+            
+            for j, (btn_label, prompt_content) in enumerate(INTRO_BUTTON_OPTIONS.items()):
+                with cols[j]:
+                    st.button(
+                        btn_label, 
+                        key=f"chat_intro_btn_{j}",
+                        on_click=handle_intro_button_click,
+                        args=(prompt_content,)
+                    )
 
     # 일반 채팅 입력 처리
     if prompt := st.chat_input("마리에게 물어보세요..."):
         st.session_state.messages.append(HumanMessage(content=prompt))
-        st.rerun()
+        st.rerun(scope="fragment")
 
     # AI 호출 로직
     if st.session_state.messages and isinstance(st.session_state.messages[-1], HumanMessage):
         with st.chat_message("assistant"):
             with st.spinner("마리가 생각 중이에요..."):
                 try:
-                    initial_state = State(
-                        messages=st.session_state.messages,
-                        memo=st.session_state.user_memo,
-                        intent="",
-                        tools_needed=[],
-                        tool_results={}
-                    )
+                    history = tuple((msg.type, msg.content) for msg in st.session_state.messages)
                     
-                    result = langgraph_app.invoke(initial_state)
+                    if len(history) == 2 and history[-1][1] in INTRO_PROMPTS:
+                        memo_json = json.dumps(st.session_state.user_memo, ensure_ascii=False, sort_keys=True)
+                        from nodes import get_memo_version
+                        result = invoke_intro_prompt(history, memo_json, get_memo_version())
+                    else:
+                        initial_state = State(
+                            messages=st.session_state.messages,
+                            memo=st.session_state.user_memo,
+                            intent="",
+                            tools_needed=[],
+                            tool_results={}
+                        )
+                        
+                        result = run_langgraph(initial_state)
                     
                     if result["messages"]:
                         ai_response = result["messages"][-1]
@@ -981,13 +1056,19 @@ def render_chat():
                     st.error(error_msg)
                     st.session_state.messages.append(AIMessage(content="죄송해요, 일시적인 문제가 발생했습니다. 다시 시도해주세요."))
 
+def _on_unlike_vendor(key):
+    vendor = st.session_state.liked_vendors.pop(key, None)
+    if vendor:
+        st.toast(f"💔 {vendor['name']}이(가) 찜 목록에서 삭제되었습니다.")
+
 def render_liked_vendors():
     st.markdown("<h2 style='text-align: center; color: var(--text-color);'>❤️ 찜한 업체 목록</h2>", unsafe_allow_html=True)
     if not st.session_state.liked_vendors:
         st.info("찜한 업체가 아직 없어요. '업체 찾기'에서 마음에 드는 업체를 찜해보세요!")
         return
 
-    for i, vendor in enumerate(st.session_state.liked_vendors):
+    # 찜 취소는 콜백에서 처리되므로 순회 중에 딕셔너리가 바뀌지 않음
+    for key, vendor in st.session_state.liked_vendors.items():
         with st.container():
             st.markdown('<div class="card">', unsafe_allow_html=True)
             st.markdown(f"<h3>{vendor.get('image', '🏢')} {vendor['name']}</h3>", unsafe_allow_html=True)
@@ -995,10 +1076,7 @@ def render_liked_vendors():
             st.markdown("---")
             st.markdown(f"**별점:** {vendor.get('rating', 'N/A')} ({vendor.get('reviews', 0)} 리뷰) | **가격:** {vendor.get('price', '문의')}")
             
-            if st.button("💔 찜 취소", key=f"unlike_{i}_{vendor['name']}"):
-                st.session_state.liked_vendors.pop(i)
-                st.toast(f"💔 {vendor['name']}이(가) 찜 목록에서 삭제되었습니다.")
-                st.rerun()
+            st.button("💔 찜 취소", key=f"unlike_{key}", on_click=_on_unlike_vendor, args=(key,))
             st.markdown('</div>', unsafe_allow_html=True)
 
 # --- 메인 함수 및 페이지 라우팅 ---
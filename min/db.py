@@ -1,44 +1,82 @@
 # db.py
 import os
+from functools import lru_cache
+from urllib.parse import quote_plus
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text, inspect
 from langchain_community.utilities import SQLDatabase
 
 load_dotenv()
 
-URI = (
-    "postgresql+psycopg2://"
-    f"{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST', 'localhost')}:{os.getenv('POSTGRES_PORT', '5432')}"
-    f"/{os.getenv('POSTGRES_DB')}"
+# 접속 정보 환경변수 (키, 환경변수명, 기본값) - 기본값이 None이면 필수
+_ENV_SPEC = (
+    ("user", "POSTGRES_USER", None),
+    ("pw", "POSTGRES_PASSWORD", None),
+    ("host", "POSTGRES_HOST", "localhost"),
+    ("port", "POSTGRES_PORT", "5432"),
+    ("db", "POSTGRES_DB", None),
 )
 
-# SQLAlchemy 엔진
-engine = create_engine(URI, future=True)
+def _build_uri() -> str:
+    """환경변수로 접속 URI 생성 (필수값이 없으면 엔진 생성 전에 바로 실패)"""
+    env = {key: os.environ.get(name, default) for key, name, default in _ENV_SPEC}
+    for key, name, _ in _ENV_SPEC:
+        if not env[key]:
+            raise RuntimeError(f"{name} not set")
+    
+    # 특수문자가 들어간 계정/비밀번호도 URI 파싱이 깨지지 않도록 인코딩
+    return (
+        f"postgresql+psycopg2://{quote_plus(env['user'])}:{quote_plus(env['pw'])}"
+        f"@{env['host']}:{env['port']}/{env['db']}"
+    )
 
-# DB 객체를 나중에 초기화하기 위해 None으로 시작
-db = None
+URI = _build_uri()
+
+# SQLAlchemy 엔진
+# - pool_pre_ping: 유휴 시간 동안 NAT/방화벽에서 끊긴 연결을 사용 전에 감지해 교체
+# - pool_recycle: 오래된 연결을 주기적으로 새로 연결
+# - statement_timeout: 오래 걸리는 쿼리가 풀의 연결을 계속 붙잡지 않도록 제한
+engine = create_engine(
+    URI,
+    future=True,
+    pool_pre_ping=True,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+    max_overflow=int(os.getenv("DB_POOL_OVERFLOW", "5")),
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    pool_timeout=10,
+    connect_args={
+        "application_name": "marryroute",
+        "options": "-c statement_timeout=15000",
+    },
+)
 
 def get_existing_tables():
     """데이터베이스에 존재하는 테이블 확인"""
     inspector = inspect(engine)
     return inspector.get_table_names()
 
+# LLM에 노출할 테이블
+BASE_TABLES = ["wedding_hall", "studio", "wedding_dress", "makeup"]
+SCHEDULE_TABLE = "user_schedule"
+
+def find_tables(names):
+    """주어진 테이블 중 public 스키마에 존재하는 것만 반환 (전체 스키마를 훑지 않고 한 번에 확인)"""
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT tablename FROM pg_tables WHERE schemaname = 'public' AND tablename = ANY(:names)"),
+            {"names": list(names)},
+        ).scalars().all()
+    return set(rows)
+
 def initialize_db():
     """DB 초기화 및 LangChain SQLDatabase 생성"""
-    global db
-    
-    # 이미 초기화되었다면 기존 객체 반환
-    if db is not None:
-        return db
-    
     try:
-        # 존재하는 테이블 확인
-        existing_tables = get_existing_tables()
-        print(f"전체 존재하는 테이블: {existing_tables}")  # 디버깅용
+        # 필요한 테이블만 존재 여부 확인
+        existing_tables = find_tables(BASE_TABLES + [SCHEDULE_TABLE])
+        print(f"존재하는 대상 테이블: {sorted(existing_tables)}")  # 디버깅용
         
         # 기본 테이블들
-        base_tables = ["wedding_hall", "studio", "wedding_dress", "makeup"]
+        base_tables = BASE_TABLES
         include_tables = []
         
         # 기본 테이블 추가
@@ -48,12 +86,11 @@ def initialize_db():
                 print(f"기본 테이블 추가: {table}")
         
         # user_schedule 테이블 추가 (명시적으로 확인)
-        if "user_schedule" in existing_tables:
-            include_tables.append("user_schedule")
+        if SCHEDULE_TABLE in existing_tables:
+            include_tables.append(SCHEDULE_TABLE)
             print(f"user_schedule 테이블 추가 성공")
         else:
             print(f"WARNING: user_schedule 테이블을 찾을 수 없습니다.")
-            print(f"존재하는 테이블들: {existing_tables}")
             # user_schedule 테이블이 없어도 진행 (웨딩 관련 기능은 유지)
         
         print(f"최종 포함할 테이블: {include_tables}")
@@ -61,36 +98,52 @@ def initialize_db():
         # include_tables가 비어있으면 기본 테이블이라도 포함
         if not include_tables:
             print("WARNING: 포함할 테이블이 없습니다. 모든 테이블을 포함합니다.")
-            include_tables = existing_tables
+            include_tables = get_existing_tables()
         
-        # LangChain SQLDatabase 생성
-        db = SQLDatabase.from_uri(
-            URI,
+        # LangChain SQLDatabase 생성 (이미 만든 엔진을 재사용해 연결 풀을 공유)
+        sql_db = SQLDatabase(
+            engine,
             include_tables=include_tables,
             sample_rows_in_table_info=0,
         )
         
         print("DB 초기화 성공!")
-        return db
+        return sql_db
         
     except Exception as e:
         print(f"DB 초기화 실패: {e}")
         print(f"오류 세부사항: {type(e).__name__}")
         return None
 
+@lru_cache(maxsize=1)
+def _load_db():
+    sql_db = initialize_db()
+    if sql_db is None:
+        # 예외는 lru_cache에 저장되지 않으므로 실패 시 다음 호출 때 다시 초기화
+        raise RuntimeError("DB 초기화 실패")
+    return sql_db
+
 def get_db():
-    """DB 객체를 안전하게 가져오는 함수"""
-    global db
-    if db is None:
-        db = initialize_db()
-    return db
+    """DB 객체를 안전하게 가져오는 함수 (처음 사용할 때 한 번만 초기화, 실패 시 None)"""
+    try:
+        return _load_db()
+    except RuntimeError:
+        return None
+
+# 테이블 스키마 정보 캐시 (실행 중에는 스키마가 바뀌지 않으므로 한 번만 조회)
+# 프로세스가 끝날 때까지 유지되므로 마이그레이션 등으로 스키마를 바꾼 뒤에는 프로세스를 재시작해야 반영됨
+_table_info = None
 
 def table_info() -> str:
-    """테이블 정보 반환"""
-    current_db = get_db()
-    if current_db:
-        return current_db.get_table_info()
-    return "DB가 초기화되지 않았습니다."
+    """테이블 정보 반환 (첫 호출 때만 DB에서 조회하고 이후에는 프로세스 수명 동안 캐시 사용)"""
+    global _table_info
+    if _table_info is None:
+        current_db = get_db()
+        if not current_db:
+            # 초기화 실패는 캐시하지 않고 다음 호출 때 다시 시도
+            return "DB가 초기화되지 않았습니다."
+        _table_info = current_db.get_table_info()
+    return _table_info
 
 if __name__ == "__main__":
     print("DB 초기화 테스트 중...")
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from langgraph.graph import START, END, StateGraph
 from state import State
 from nodes import (
@@ -11,44 +12,60 @@ from nodes import (
 from routers import conditional_router
 
 
-# StateGraph 빌더 생성
-builder = StateGraph(State)
-
-# 노드 추가
-builder.add_node("parsing_node", parsing_node)
-builder.add_node("memo_check_node", memo_check_node)    
-builder.add_node("tool_execution_node", tool_execution_node)
-builder.add_node("memo_update_node", memo_update_node)
-builder.add_node("response_generation_node", response_generation_node)
-builder.add_node("general_response_node", general_response_node)
-
-# 시작점 연결
-builder.add_edge(START, "parsing_node")
-builder.add_edge("parsing_node", "memo_check_node")
-
-builder.add_conditional_edges(
-    "memo_check_node",  
-    conditional_router,
-    {
-        "tool_execution": "tool_execution_node",
-        "general_response": "general_response_node"
-    }
-)
+def create_wedding_planner_graph() -> StateGraph:
+    """웨딩 챗봇 StateGraph 빌더 생성 (노드/엣지 등록)"""
+    # StateGraph 빌더 생성
+    builder = StateGraph(State)
+
+    # 노드 추가
+    builder.add_node("parsing_node", parsing_node)
+    builder.add_node("memo_check_node", memo_check_node)    
+    builder.add_node("tool_execution_node", tool_execution_node)
+    builder.add_node("memo_update_node", memo_update_node)
+    builder.add_node("response_generation_node", response_generation_node)
+    builder.add_node("general_response_node", general_response_node)
+
+    # 시작점 연결 - 파싱(LLM)과 메모 로드(파일 IO)는 서로 의존하지 않으므로 병렬 실행
+    # 두 노드가 쓰는 키가 겹치지 않아(intent/tools_needed/tool_results vs memo) 리듀서 불필요
+    builder.add_edge(START, "parsing_node")
+    builder.add_edge(START, "memo_check_node")
+
+    # 라우터는 parsing_node가 쓴 값만 볼 수 있음 (같은 슈퍼스텝의 memo_check_node 결과는 아직 반영 전)
+    # → conditional_router는 파싱 결과(intent)로만 판단하고 memo를 읽으면 안 됨
+    # 다음 노드들은 다음 슈퍼스텝에서 실행되므로 memo_check_node가 로드한 memo를 볼 수 있음
+    builder.add_conditional_edges(
+        "parsing_node",
+        conditional_router,
+        {
+            "tool_execution": "tool_execution_node",
+            "general_response": "general_response_node"
+        }
+    )
+
+    # 툴 실행 플로우
+    builder.add_edge("tool_execution_node", "memo_update_node")
+    builder.add_edge("memo_update_node", "response_generation_node")
+    builder.add_edge("response_generation_node", END)
 
-# 툴 실행 플로우
-builder.add_edge("tool_execution_node", "memo_update_node")
-builder.add_edge("memo_update_node", "response_generation_node")
-builder.add_edge("response_generation_node", END)
+    # 일반 응답 플로우
+    builder.add_edge("general_response_node", END)
+    
+    return builder
 
-# 일반 응답 플로우
-builder.add_edge("general_response_node", END)
+# 그래프 컴파일 - 프로세스당 한 번만 컴파일하고 이후에는 같은 객체 재사용
+@lru_cache(maxsize=1)
+def get_app():
+    return create_wedding_planner_graph().compile()
 
-# 그래프 컴파일
-app = builder.compile()
+def __getattr__(name):
+    """`from graph import app` 호환 (langgraph.json 등) - 처음 접근할 때 컴파일"""
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # 디버깅용 - 그래프 구조 확인
 if __name__ == "__main__":
     print("웨딩 챗봇 그래프가 성공적으로 생성되었습니다!")
     print("사용 가능한 노드들:")
-    for node in app.get_graph().nodes:
+    for node in get_app().get_graph().nodes:
         print(f"- {node}")
\ No newline at end of file
@@ -1,12 +1,37 @@
 import os
+import copy
 import asyncio
-from langchain_core.messages import HumanMessage
-from graph import app
+from langchain_core.messages import HumanMessage, AIMessageChunk
+from prompt_toolkit import PromptSession
+from graph import get_app
 from state import State
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# 최종 답변을 만드는 노드 (파싱/메모 추출 LLM 출력은 화면에 스트리밍하지 않음)
+RESPONSE_NODES = ("response_generation_node", "general_response_node")
+
+# 새 대화의 기본 메모 (모듈 로드 시 한 번만 정의, 대화마다 복사해서 사용)
+DEFAULT_MEMO = {
+    "budget": "",
+    "preferred_location": "",
+    "wedding_date": "",
+    "style": "",
+    "confirmed_vendors": {},
+    "notes": []
+}
+
+def make_initial_state(messages) -> State:
+    """새 대화/질문용 초기 상태 생성 (중첩 dict/list가 대화끼리 공유되지 않도록 메모는 깊은 복사)"""
+    return State(
+        messages=messages,
+        memo=copy.deepcopy(DEFAULT_MEMO),
+        intent="",
+        tools_needed=[],
+        tool_results={}
+    )
+
 async def run_chat():
     """웨딩 챗봇과 대화하기"""
     
@@ -15,25 +40,13 @@ async def run_chat():
     print("종료하려면 'quit' 또는 'exit'를 입력하세요.\n")
     
     # 초기 상태 설정
-    current_state = State(
-        messages=[],
-        memo={
-            "budget": "",
-            "preferred_location": "",
-            "wedding_date": "",
-            "style": "",
-            "confirmed_vendors": {},
-            "notes": []
-        },
-        intent="",
-        tools_needed=[],
-        tool_results={}
-    )
+    current_state = make_initial_state([])
+    prompt_session = PromptSession()
     
     while True:
         try:
-            # 사용자 입력 받기
-            user_input = input("\n👤 사용자: ").strip()
+            # 사용자 입력 받기 - 입력을 기다리는 동안에도 이벤트 루프가 막히지 않도록 비동기로 대기
+            user_input = (await prompt_session.prompt_async("\n👤 사용자: ")).strip()
             
             if user_input.lower() in ['quit', 'exit', '종료', '끝']:
                 print("👋 웨딩 챗봇을 이용해주셔서 감사합니다!")
@@ -43,29 +56,47 @@ async def run_chat():
                 continue
             
             # 사용자 메시지를 상태에 추가
-            current_state.messages.append(HumanMessage(content=user_input))
+            current_state["messages"].append(HumanMessage(content=user_input))
             
             print("🤖 처리 중...")
             
-            # 그래프 실행
-            result = await app.ainvoke(current_state)
+            # 그래프 실행 - 전체 결과를 기다리지 않고 답변 토큰을 생성되는 대로 출력
+            # (messages: LLM 토큰 스트림, values: 각 단계 후 상태 - 마지막 값이 최종 상태)
+            result = None
+            streamed = False
+            async for mode, chunk in get_app().astream(current_state, stream_mode=["messages", "values"]):
+                if mode == "values":
+                    result = chunk
+                    continue
+                
+                # 토큰 조각(AIMessageChunk)만 출력 - 노드가 반환한 완성 메시지도 messages 모드로 다시 오므로 제외
+                message_chunk, metadata = chunk
+                if (isinstance(message_chunk, AIMessageChunk)
+                        and metadata.get("langgraph_node") in RESPONSE_NODES and message_chunk.content):
+                    if not streamed:
+                        print("🤖 챗봇: ", end="", flush=True)
+                        streamed = True
+                    print(message_chunk.content, end="", flush=True)
             
-            # AI 응답 출력
-            if result.messages and len(result.messages) > 0:
-                last_message = result.messages[-1]
+            # AI 응답 출력 (스트리밍된 경우 줄바꿈만)
+            if streamed:
+                print()
+            elif result and result["messages"]:
+                last_message = result["messages"][-1]
                 if hasattr(last_message, 'content'):
                     print(f"🤖 챗봇: {last_message.content}")
                 else:
                     print("🤖 챗봇: 응답을 생성하는 중 문제가 발생했습니다.")
             
             # 상태 업데이트 (메모리 유지)
-            current_state = result
+            if result:
+                current_state = result
             
             # 디버깅 정보 (선택적)
-            if os.getenv('DEBUG', 'false').lower() == 'true':
-                print(f"\n[DEBUG] Intent: {result.intent}")
-                print(f"[DEBUG] Tools needed: {result.tools_needed}")
-                print(f"[DEBUG] Memo: {result.memo}")
+            if result and os.getenv('DEBUG', 'false').lower() == 'true':
+                print(f"\n[DEBUG] Intent: {result['intent']}")
+                print(f"[DEBUG] Tools needed: {result['tools_needed']}")
+                print(f"[DEBUG] Memo: {result['memo']}")
                 
         except KeyboardInterrupt:
             print("\n👋 웨딩 챗봇을 이용해주셔서 감사합니다!")
@@ -74,32 +105,19 @@ async def run_chat():
             print(f"❌ 오류가 발생했습니다: {e}")
             print("다시 시도해주세요.")
 
-def run_single_query(query: str):
+async def run_single_query(query: str):
     """단일 질문 테스트용 함수"""
     
-    initial_state = State(
-        messages=[HumanMessage(content=query)],
-        memo={
-            "budget": "",
-            "preferred_location": "",
-            "wedding_date": "",
-            "style": "",
-            "confirmed_vendors": {},
-            "notes": []
-        },
-        intent="",
-        tools_needed=[],
-        tool_results={}
-    )
+    initial_state = make_initial_state([HumanMessage(content=query)])
     
     try:
-        result = app.invoke(initial_state)
-        if result.messages and len(result.messages) > 0:
-            last_message = result.messages[-1]
+        result = await get_app().ainvoke(initial_state)
+        if result["messages"]:
+            last_message = result["messages"][-1]
             print(f"질문: {query}")
             print(f"답변: {last_message.content}")
-            print(f"의도: {result.intent}")
-            print(f"사용된 툴: {result.tools_needed}")
+            print(f"의도: {result['intent']}")
+            print(f"사용된 툴: {result['tools_needed']}")
         return result
     except Exception as e:
         print(f"오류: {e}")
@@ -119,9 +137,10 @@ async def test_scenarios():
     
     print("🧪 테스트 시나리오 실행 중...\n")
     
+    # 시나리오들이 같은 사용자 메모 파일(./memories/<DEFAULT_USER_ID>.json)을 읽고 쓰므로 순서대로 실행
     for i, test_case in enumerate(test_cases, 1):
         print(f"[테스트 {i}] {test_case}")
-        result = run_single_query(test_case)
+        result = await run_single_query(test_case)
         print("-" * 50)
         await asyncio.sleep(1)  # API 호출 간격
 
@@ -136,7 +155,7 @@ if __name__ == "__main__":
             # 단일 쿼리 모드
             if len(sys.argv) > 2:
                 query = " ".join(sys.argv[2:])
-                run_single_query(query)
+                asyncio.run(run_single_query(query))
             else:
                 print("사용법: python main.py single '질문 내용'")
         else:
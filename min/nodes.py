@@ -1,22 +1,148 @@
 import os
 import json
+import copy
+import threading
+import time
+import tempfile
+import hashlib
+import sqlite3
+import unicodedata
 from datetime import datetime
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
+from typing import Dict, Any, Optional, List, Literal
+from typing_extensions import TypedDict
+from functools import lru_cache
+from cachetools import TTLCache, LRUCache
 from langchain_core.messages import HumanMessage, AIMessage
 from state import State
-from tools import execute_tools
+# tools.py와 같은 설정(gpt-4o-mini, temperature 0.1)의 LLM 인스턴스를 공유 - 클라이언트/커넥션 풀 하나만 사용
+from tools import aexecute_tools, llm
 from dotenv import load_dotenv
 
 load_dotenv()
 
-llm = ChatOpenAI(
-    model="gpt-4o-mini",
-    temperature=0.1,
-    api_key=os.getenv('OPENAI_API_KEY')
-)
+# 메모 파일 읽기 캐시 (메모 경로 → (파일 mtime, 파싱된 메모)) - 대화 턴마다 같은 파일을 다시 읽고 파싱하지 않도록
+# 조회할 때 stat()으로 mtime을 비교하므로 외부에서 파일을 고쳐도 바로 다시 읽음
+MEMO_CACHE_TTL = 300
+_memo_cache = TTLCache(maxsize=128, ttl=MEMO_CACHE_TTL)
+_memo_cache_lock = threading.Lock()  # sync 노드는 스레드에서 실행되므로 캐시 접근은 락으로 보호
 
-def parsing_node(state) -> Dict[str, Any]:
+def get_memo_path() -> str:
+    """현재 사용자의 메모 파일 경로"""
+    user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
+    return f"./memories/{user_id}.json"
+
+def get_memo_version() -> Optional[int]:
+    """현재 사용자 메모 파일의 mtime (파일이 없으면 None) - 메모 파일 내용을 캐시 키에 반영할 때 사용"""
+    return _memo_mtime(get_memo_path())
+
+def _memo_mtime(memo_path: str) -> Optional[int]:
+    try:
+        return os.stat(memo_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+def save_memo_file(memo_path: str, memo: Dict[str, Any]) -> None:
+    """메모 파일 저장 - 임시 파일에 쓴 뒤 os.replace로 교체해 읽는 쪽이 반쯤 쓰인 파일을 보지 않도록 함"""
+    # 동시에 저장하는 쪽끼리 임시 파일이 겹치지 않도록 같은 디렉토리에 고유한 임시 파일 생성
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(memo_path) or ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(memo, f, ensure_ascii=False, indent=2)
+        # mkstemp는 0600으로 만들므로 기존 파일이 있으면 그 권한을 그대로 유지
+        if os.path.exists(memo_path):
+            os.chmod(tmp_path, os.stat(memo_path).st_mode)
+        os.replace(tmp_path, memo_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    with _memo_cache_lock:
+        _memo_cache[memo_path] = (_memo_mtime(memo_path), copy.deepcopy(memo))
+
+# 의도 파싱 결과 구조 - OpenAI structured output(strict json_schema)으로 서버에서 형식 강제
+class ParsingOutput(TypedDict):
+    intent: Literal["wedding", "schedule", "general"]
+    tools: List[Literal["db_query", "calculator", "web_search", "memo_update", "user_db_update"]]
+
+parsing_llm = llm.with_structured_output(ParsingOutput, method="json_schema", strict=True)
+
+# 의도 파싱 LLM 응답 캐시 (프롬프트 → 응답) - 같은 메시지/메모/최근 대화 조합이면 LLM 호출 생략
+# 프롬프트 전체를 키로 쓰므로 메모나 대화 맥락이 달라지면 자연스럽게 캐시 미스
+_parse_cache = LRUCache(maxsize=1024)
+
+def normalize_message(text: str) -> str:
+    """캐시 적중률을 위해 유니코드(NFKC)와 공백 정규화"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+# 프로세스 재시작/여러 워커 사이에서도 파싱 결과를 재사용하기 위한 디스크 캐시 (메모리 캐시 아래 단계)
+# 키는 모델명 + 프롬프트 해시라 프롬프트 문구나 모델이 바뀌면 자동으로 새 키 (개인정보는 해시로만 저장)
+# 프롬프트에 메모/최근 대화가 들어가 재사용되지 않는 키가 많으므로 보관 기간과 최대 행 수로 크기를 제한
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH", "./.cache/parse_cache.db")
+PARSE_CACHE_TTL = 7 * 24 * 3600   # 초 단위 보관 기간
+PARSE_CACHE_MAX_ROWS = 10000
+
+@lru_cache(maxsize=1)
+def _parse_cache_db():
+    os.makedirs(os.path.dirname(PARSE_CACHE_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(PARSE_CACHE_PATH, check_same_thread=False, isolation_level=None)
+    # created_at 컬럼이 없는 이전 형식의 캐시 테이블은 버리고 새로 생성 (캐시라 데이터 보존 불필요)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(parse_cache)")]
+    if columns and "created_at" not in columns:
+        conn.execute("DROP TABLE parse_cache")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS parse_cache (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_parse_cache_created_at ON parse_cache (created_at)")
+    return conn
+
+def _parse_cache_key(prompt: str) -> str:
+    return hashlib.sha256(f"{llm.model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+def get_cached_parse(prompt: str) -> Optional[ParsingOutput]:
+    """파싱 결과 캐시 조회 (메모리 → 디스크 순서, 디스크에서 찾으면 메모리에도 올림)"""
+    answer = _parse_cache.get(prompt)
+    if answer is None:
+        try:
+            row = _parse_cache_db().execute(
+                "SELECT answer FROM parse_cache WHERE key = ? AND created_at > ?",
+                (_parse_cache_key(prompt), time.time() - PARSE_CACHE_TTL)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"[ERROR] 파싱 디스크 캐시 조회 실패: {e}")
+            return None
+        if not row:
+            return None
+        answer = row[0]
+    # JSON 문자열로 저장해 두고 꺼낼 때마다 새 dict로 복원 (호출 측에서 수정해도 캐시는 그대로)
+    # 이전 형식("의도,툴,툴")으로 저장된 행은 JSON이 아니므로 캐시 미스로 처리
+    try:
+        parsed = json.loads(answer)
+    except ValueError:
+        return None
+    _parse_cache[prompt] = answer
+    return parsed
+
+def set_cached_parse(prompt: str, parsed: ParsingOutput) -> None:
+    """파싱 결과를 JSON으로 메모리/디스크 캐시에 저장 (디스크 저장 실패는 무시, 저장할 때 오래된 행 정리)"""
+    answer = json.dumps(parsed, ensure_ascii=False)
+    _parse_cache[prompt] = answer
+    now = time.time()
+    try:
+        conn = _parse_cache_db()
+        conn.execute(
+            "INSERT OR REPLACE INTO parse_cache (key, answer, created_at) VALUES (?, ?, ?)",
+            (_parse_cache_key(prompt), answer, now)
+        )
+        conn.execute("DELETE FROM parse_cache WHERE created_at <= ?", (now - PARSE_CACHE_TTL,))
+        conn.execute(
+            "DELETE FROM parse_cache WHERE key IN "
+            "(SELECT key FROM parse_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (PARSE_CACHE_MAX_ROWS,)
+        )
+    except sqlite3.Error as e:
+        print(f"[ERROR] 파싱 디스크 캐시 저장 실패: {e}")
+
+async def parsing_node(state) -> Dict[str, Any]:
     """사용자 메시지의 의도를 파싱하고 필요한 툴 판단 (디버깅 강화 버전)"""
     last_message = state["messages"][-1].content if state["messages"] else ""
     memo = state.get("memo", {})
@@ -59,7 +185,7 @@ def parsing_node(state) -> Dict[str, Any]:
                 previous_context += msg.content + " "
     
     prompt = f"""
-사용자 메시지: {last_message}
+사용자 메시지: {normalize_message(last_message)}
 현재 메모: {json.dumps(memo, ensure_ascii=False)}
 최근 대화 컨텍스트: {previous_context}
 
@@ -111,35 +237,30 @@ def parsing_node(state) -> Dict[str, Any]:
 "5000만원 예산 분배해줘" → wedding,calculator,memo_update
 "안녕하세요" → general,
 
-답변 형식:
-schedule,user_db_update (일정 관리)
-wedding,memo_update (개인정보 저장)
-wedding,web_search (웹 검색만 필요)
-wedding,db_query,web_search (업체 추천 + 상세정보)
-wedding,calculator,memo_update (계산 + 메모 저장)
-general, (일반 대화)
-
-답변:
+답변 형식: intent에 의도, tools에 필요한 툴 목록 (예시의 "의도,툴,툴"과 같은 내용)
+- schedule + [user_db_update] (일정 관리)
+- wedding + [memo_update] (개인정보 저장)
+- wedding + [web_search] (웹 검색만 필요)
+- wedding + [db_query, web_search] (업체 추천 + 상세정보)
+- wedding + [calculator, memo_update] (계산 + 메모 저장)
+- general + [] (일반 대화)
 """
     
     try:
         print(f"[DEBUG] LLM에게 보내는 프롬프트 일부: {prompt[:200]}...")
         
-        response = llm.invoke([HumanMessage(content=prompt)])
-        response_content = response.content.strip()
-        
-        print(f"[DEBUG] LLM 원본 응답: '{response_content}'")
-        
-        parts = response_content.split(',')
+        parsed = get_cached_parse(prompt)
+        if parsed is None:
+            parsed = await parsing_llm.ainvoke([HumanMessage(content=prompt)])
+            set_cached_parse(prompt, parsed)
+        else:
+            print(f"[DEBUG] 파싱 캐시 사용")
         
-        intent = "wedding" if "wedding" in parts[0].lower() else "schedule" if "schedule" in parts[0].lower() else "general"
+        print(f"[DEBUG] LLM 원본 응답: {parsed}")
         
-        tools_needed = []
-        if len(parts) > 1:
-            for i in range(1, len(parts)):
-                tool = parts[i].strip()
-                if tool and tool in ["db_query", "calculator", "web_search", "memo_update", "user_db_update"]:
-                    tools_needed.append(tool)
+        # strict structured output이라 intent/tools 값은 스키마의 enum으로 보장됨
+        intent = parsed["intent"]
+        tools_needed = list(parsed["tools"])
         
         print(f"[DEBUG] 파싱된 Intent: {intent}")
         print(f"[DEBUG] 파싱된 Tools: {tools_needed}")
@@ -198,17 +319,16 @@ general, (일반 대화)
 
 
 def memo_check_node(state: State) -> Dict[str, Any]:
-    """메모 파일을 로드하고 없으면 새로운 구조로 자동 생성"""
-    user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
-    memo_path = f"./memories/{user_id}.json"
+    """메모 파일을 로드하고 없으면 새로운 구조의 기본 메모 사용 (읽기 전용)"""
+    memo_path = get_memo_path()
     
-    # memories 디렉토리 생성
-    os.makedirs("./memories", exist_ok=True)
-    
-    # 현재 사용자 메시지와 파싱된 의도
-    current_message = state["messages"][-1].content if state["messages"] else ""
-    current_intent = state.get("intent", "")
-    tools_needed = state.get("tools_needed", [])
+    # 파일이 캐시 이후 바뀌지 않았으면 읽지 않음 (호출 측에서 수정해도 캐시가 바뀌지 않도록 복사본 반환)
+    mtime = _memo_mtime(memo_path)
+    with _memo_cache_lock:
+        cached = _memo_cache.get(memo_path)
+    if cached is not None and mtime is not None and cached[0] == mtime:
+        print(f"[DEBUG] 메모 캐시 사용: {memo_path}")
+        return {"memo": copy.deepcopy(cached[1])}
     
     # 새로운 구조의 기본 메모 정의 (schedule 필드 추가)
     default_memo = {
@@ -243,43 +363,29 @@ def memo_check_node(state: State) -> Dict[str, Any]:
         }
     }
     
-    # 메모 파일 로드 또는 생성
+    # 메모 파일 로드 (읽기 경로에서는 파일을 쓰지 않음 - 저장은 memo_update_node에서만)
     try:
         if os.path.exists(memo_path):
-            # 기존 파일 로드
             with open(memo_path, 'r', encoding='utf-8') as f:
                 existing_memo = json.load(f)
             
-            # 기존 메모에 schedule 필드가 없으면 추가
+            # 기존 메모에 schedule 필드가 없으면 메모리상에서만 추가 (다음 저장 때 같이 기록됨)
             if "schedule" not in existing_memo:
-                existing_memo["schedule"] = {
-                    "sync_with_db": True,
-                    "last_sync": "",
-                    "cache": []
-                }
-                # 수정된 메모를 파일에 저장
-                with open(memo_path, 'w', encoding='utf-8') as f:
-                    json.dump(existing_memo, f, ensure_ascii=False, indent=2)
-                print(f"[DEBUG] 기존 메모에 schedule 필드 추가 완료")
+                existing_memo["schedule"] = default_memo["schedule"]
             
+            # 읽기 전에 잰 mtime으로 저장 - 그 사이 파일이 바뀌었으면 다음 조회 때 다시 읽음
+            with _memo_cache_lock:
+                _memo_cache[memo_path] = (mtime, copy.deepcopy(existing_memo))
             print(f"[DEBUG] 기존 메모 파일 로드: {memo_path}")
         else:
-            # 파일이 없으면 새로운 구조로 생성
-            existing_memo = default_memo.copy()
-            with open(memo_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_memo, f, ensure_ascii=False, indent=2)
-            print(f"[DEBUG] 새 메모 파일 생성 완료: {memo_path}")
+            # 파일이 없으면 기본 구조 사용 (처음 업데이트될 때 파일 생성)
+            existing_memo = default_memo
+            print(f"[DEBUG] 메모 파일 없음 - 기본 메모 사용: {memo_path}")
             
     except Exception as e:
+        # 깨진 파일을 기본값으로 덮어쓰지 않고 이번 턴만 기본 구조 사용
         print(f"메모 파일 처리 오류: {e}")
-        # 오류 시 기본 구조 사용하고 다시 저장 시도
-        existing_memo = default_memo.copy()
-        try:
-            with open(memo_path, 'w', encoding='utf-8') as f:
-                json.dump(existing_memo, f, ensure_ascii=False, indent=2)
-            print(f"[DEBUG] 오류 후 새 메모 파일 생성 완료")
-        except:
-            print(f"[ERROR] 메모 파일 생성 실패")
+        existing_memo = default_memo
     
     # 기존 상태를 보존하면서 메모만 추가/업데이트
     return {
@@ -288,7 +394,7 @@ def memo_check_node(state: State) -> Dict[str, Any]:
     }
     
 
-def tool_execution_node(state: State) -> Dict[str, Any]:
+async def tool_execution_node(state: State) -> Dict[str, Any]:
     """필요한 툴들을 실행하고 결과 저장"""
     
     tools_needed = state.get("tools_needed", [])
@@ -302,8 +408,8 @@ def tool_execution_node(state: State) -> Dict[str, Any]:
     memo = state.get("memo", {})
     
     try:
-        # tools.py의 execute_tools 함수 사용
-        tool_results = execute_tools(
+        # tools.py의 aexecute_tools 함수 사용 (독립적인 툴은 동시에 실행)
+        tool_results = await aexecute_tools(
             tools_needed=tools_needed,
             user_message=last_message,
             user_memo=memo
@@ -322,10 +428,9 @@ def tool_execution_node(state: State) -> Dict[str, Any]:
             }
         return {"tool_results": error_results}
     
-def memo_update_node(state: State) -> Dict[str, Any]:
+async def memo_update_node(state: State) -> Dict[str, Any]:
     """사용자 메모리 업데이트 - 새로운 메모 구조에 맞게 정보 추출"""
-    user_id = os.getenv('DEFAULT_USER_ID', 'mvp-test-user')
-    memo_path = f"./memories/{user_id}.json"
+    memo_path = get_memo_path()
     
     # memories 디렉토리 생성
     os.makedirs("./memories", exist_ok=True)
@@ -333,39 +438,10 @@ def memo_update_node(state: State) -> Dict[str, Any]:
     # 현재 사용자 입력
     current_input = state["messages"][-1].content if state["messages"] else ""
     
-    # 기존 메모 로드 (새로운 구조)
-    try:
-        if os.path.exists(memo_path):
-            with open(memo_path, 'r', encoding='utf-8') as f:
-                existing_memo = json.load(f)
-        else:
-            existing_memo = {
-                "name": "",
-                "birthdate": "",
-                "address": "",
-                "job": "",
-                "spouse": {
-                    "name": "",
-                    "birthdate": "",
-                    "address": "",
-                    "job": "",
-                },
-                "budget": {
-                    "total": "",
-                    "wedding_hall": "",
-                    "wedding_dress": "",
-                    "studio": "",
-                    "makeup": "",
-                    "etc": ""
-                },
-                "type": "",
-                "preferred_locations": [],
-                "wedding_date": "",
-                "preferences": [],
-                "confirmed_vendors": {},
-                "changes": []
-            }
-    except:
+    # 기존 메모 - memo_check_node가 이번 턴에 파일에서 읽어 둔 메모를 재사용 (파일 재로드 없음)
+    # 아래에서 중첩 dict/list를 직접 수정하므로 state의 메모를 건드리지 않도록 복사해서 사용
+    existing_memo = copy.deepcopy(state.get("memo") or {})
+    if not existing_memo:
         existing_memo = {
             "name": "", "birthdate": "", "address": "", "job": "",
             "spouse": {"name": "", "birthdate": "", "address": "", "job": ""},
@@ -373,6 +449,7 @@ def memo_update_node(state: State) -> Dict[str, Any]:
             "type": "", "preferred_locations": [], "wedding_date": "", "preferences": [], 
             "confirmed_vendors": {}, "changes": []
         }
+    existing_memo.setdefault("changes", [])
     
     # LLM으로 사용자 입력에서 정보 추출 (새로운 구조에 맞게)
     prompt = f"""
@@ -443,7 +520,7 @@ JSON만 반환:
 """
 
     try:
-        response = llm.invoke([HumanMessage(content=prompt)])
+        response = await llm.ainvoke([HumanMessage(content=prompt)])
         new_info = json.loads(response.content.strip())
         
         print(f"[DEBUG] 추출된 정보: {new_info}")
@@ -514,8 +591,7 @@ JSON만 반환:
             
             # 업데이트된 경우에만 파일 저장
             if updated:
-                with open(memo_path, 'w', encoding='utf-8') as f:
-                    json.dump(existing_memo, f, ensure_ascii=False, indent=2)
+                save_memo_file(memo_path, existing_memo)
                 print(f"[DEBUG] 새로운 구조로 메모 파일 저장 완료")
         
         return {
@@ -529,7 +605,7 @@ JSON만 반환:
         }
         
     
-def response_generation_node(state: State) -> Dict[str, Any]:
+async def response_generation_node(state: State) -> Dict[str, Any]:
     """툴 실행 결과를 바탕으로 최종 응답 생성 (새로운 메모 구조 반영)"""
     
     last_message = state["messages"][-1].content
@@ -614,7 +690,7 @@ def response_generation_node(state: State) -> Dict[str, Any]:
     고객의 예산, 선호지역, 취향 등을 고려해서 맞춤형 조언을 제공하세요.
     """
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
     
     # 새로운 메시지 리스트 생성
     new_messages = state["messages"] + [AIMessage(content=response.content)]
@@ -623,7 +699,7 @@ def response_generation_node(state: State) -> Dict[str, Any]:
         "messages": new_messages
     }
 
-def general_response_node(state: State) -> Dict[str, Any]:
+async def general_response_node(state: State) -> Dict[str, Any]:
     """새로운 메모 구조를 활용한 일반적인 대화 응답 생성"""
     
     last_message = state["messages"][-1].content
@@ -686,7 +762,7 @@ def general_response_node(state: State) -> Dict[str, Any]:
     친근하고 자연스러운 답변을 해주세요.
     """
     
-    response = llm.invoke([HumanMessage(content=prompt)])
+    response = await llm.ainvoke([HumanMessage(content=prompt)])
     
     # 새로운 메시지 리스트 생성
     new_messages = state["messages"] + [AIMessage(content=response.content)]
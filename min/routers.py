@@ -1,10 +1,12 @@
 from state import State
 
+# intent → 다음 경로 (목록에 없는 intent는 general_response)
+INTENT_ROUTES = {
+    "wedding": "tool_execution",
+}
+
 def conditional_router(state: State) -> str:
     """intent를 보고 라우팅 결정"""
     
     # 웨딩 관련이면 tool_execution으로, 아니면 general_response로
-    if state.get("intent") == "wedding":
-        return "tool_execution"
-    else:
-        return "general_response"
\ No newline at end of file
+    return INTENT_ROUTES.get(state.get("intent"), "general_response")
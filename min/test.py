@@ -5,8 +5,12 @@ AI 웨딩 플래너 챗봇 실행 스크립트 - 개선된 버전
 
 from graph import app  # 여기서 app은 컴파일된 그래프
 from state import State
+import asyncio
 import json
 
+# 노드가 async라 ainvoke 사용 - 여러 번 호출해도 같은 이벤트 루프에서 실행
+loop = asyncio.new_event_loop()
+
 def test_chatbot():
     """챗봇 테스트 함수"""
     
@@ -33,7 +37,7 @@ def test_chatbot():
     
     try:
         # 그래프 실행
-        result = app.invoke(initial_state)
+        result = loop.run_until_complete(app.ainvoke(initial_state))
         
         print("✅ 실행 완료!")
         print(f"📤 최종 응답: {result.get('response', 'No response')}")
@@ -116,7 +120,7 @@ def interactive_mode():
         
         try:
             # 그래프 실행
-            result = app.invoke(state)
+            result = loop.run_until_complete(app.ainvoke(state))
             
             # 응답 추출 및 출력 (여러 가능한 키 확인)
             response = (result.get('response', '') or 
@@ -221,7 +225,7 @@ def simple_test():
         }
         
         try:
-            result = app.invoke(state)
+            result = loop.run_until_complete(app.ainvoke(state))
             
             # 응답 키 확인 (여러 가능성)
             response = (result.get('response', '') or 
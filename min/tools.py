@@ -1,18 +1,70 @@
 import os
 import json
 import re
-from typing import Dict, Any, List
-from datetime import datetime, date, time
-from langchain_core.tools import tool
+import asyncio
+from typing import Dict, Any, List, Optional, Literal
+from typing_extensions import TypedDict
+from contextlib import contextmanager
+from functools import lru_cache
+from datetime import datetime
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
-from db import db, engine
 import psycopg2
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# PostgreSQL 연결 - 블록이 끝나면 커밋(예외 시 롤백)하고 연결을 닫음
+# keepalive 설정으로 NAT/방화벽 뒤에서 유휴 TCP 연결이 조용히 끊기지 않도록 함
+@contextmanager
+def get_pg_connection():
+    conn = psycopg2.connect(
+        host=os.getenv('POSTGRES_HOST'),
+        port=os.getenv('POSTGRES_PORT', '5432'), 
+        database=os.getenv('POSTGRES_DB'),
+        user=os.getenv('POSTGRES_USER'),
+        password=os.getenv('POSTGRES_PASSWORD'),
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3
+    )
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+# db_query_tool 결과로 가져올 최대 행 수
+DB_QUERY_MAX_ROWS = 50
+
+# 업체 테이블별 가격 컬럼 (studio 테이블에는 min_fee가 없고 std_price를 사용)
+VENDOR_PRICE_COLUMNS = {
+    "wedding_dress": "min_fee",
+    "wedding_hall": "min_fee",
+    "makeup": "min_fee",
+    "studio": "std_price",
+}
+
+# 테이블별 고정 SQL - 지역/예산/개수는 SQL 문자열에 넣지 않고 파라미터로만 바인딩
+# (LLM이 만든 SQL을 그대로 실행하지 않으므로 인젝션 위험이 없고, 문장 종류도 테이블 수만큼으로 고정)
+DB_QUERY_SQL = {
+    table_name: f"""SELECT conm, {price_column}, subway FROM {table_name}
+WHERE (%(region)s IS NULL OR subway LIKE %(region)s)
+  AND (%(max_price)s IS NULL OR {price_column} <= %(max_price)s)
+ORDER BY CASE WHEN %(by_price)s THEN {price_column} END ASC, conm ASC
+LIMIT %(limit)s"""
+    for table_name, price_column in VENDOR_PRICE_COLUMNS.items()
+}
+
+# db_query_tool에서 LLM이 채우는 검색 조건 (SQL 대신 조건만 받음)
+class VendorQuery(TypedDict):
+    vendor_type: Literal["wedding_dress", "wedding_hall", "makeup", "studio"]
+    region: Optional[str]
+    max_price: Optional[int]
+    limit: int
+
 # 안전한 타입 체크 유틸리티 함수
 def safe_str_join(items, separator=" "):
     """안전하게 리스트를 문자열로 연결"""
@@ -35,6 +87,9 @@ llm = ChatOpenAI(
     api_key=os.getenv('OPENAI_API_KEY')
 )
 
+# db_query_tool 검색 조건 추출용 (structured output 래퍼는 한 번만 생성해 재사용)
+vendor_query_llm = llm.with_structured_output(VendorQuery, method="json_schema", strict=True)
+
 # Tavily 웹 검색 초기화
 tavily_search = TavilySearchResults(
     max_results=5,
@@ -98,99 +153,60 @@ def db_query_tool(query_request: str, user_memo: Dict[str, Any] = None) -> Dict[
         print(f"[DEBUG] 추출된 예산: {budget}")
         print(f"[DEBUG] 추출된 선호지역: {location}")
         
-        # 테이블 정보 가져오기
-        table_info = db.get_table_info()
-        print(f"[DEBUG] 사용 가능한 테이블: {table_info[:500]}...")
-        
-        # 개선된 SQL 생성 프롬프트 (실제 컬럼만 사용)
-        sql_generation_prompt = f"""
-다음 테이블 정보를 참고해서 사용자 요청에 맞는 SQL 쿼리를 작성해주세요.
-
-테이블 정보:
-{table_info}
+        # 검색 조건 추출 프롬프트 (SQL은 DB_QUERY_SQL의 고정 문장 사용)
+        condition_prompt = f"""
+사용자 요청에 맞는 웨딩 업체 검색 조건을 추출해주세요.
 
 사용자 요청: {actual_query}
 사용자 예산: {budget}
 선호 지역: {location}
 
-**중요: 실제 존재하는 컬럼만 사용**
-1. wedding_dress 테이블: "conm","wedding","photo","wedding+photo","fitting_fee","helper","min_fee","subway"
-2. wedding_hall 테이블: "conm","season(T/F)","peak(T/F)","hall_rental_fee","meal_expense","num_guarantors","min_fee","snapphoto","snapvideo","subway"
-3. makeup 테이블: "conm","manager(1)","manager(2)","vicedirector(1)","vicedirector(2)","director(1)","director(2)","min_fee","subway"
-4. studio 테이블: "conm","std_price","afternoon_price","allday_price","subway"
-
-**쿼리 작성 규칙:**
-1. 업체 유형 매핑:
-   - "드레스" 관련 요청 → wedding_dress 테이블, min_fee 사용
-   - "웨딩홀", "예식장" 관련 요청 → wedding_hall 테이블, min_fee 사용  
-   - "스튜디오", "촬영" 관련 요청 → studio 테이블, std_price 사용
-   - "메이크업" 관련 요청 → makeup 테이블, min_fee 사용
-
-2. 컬럼 선택 (존재하는 컬럼만):
-   - wedding_dress: SELECT conm, min_fee, subway FROM wedding_dress
-   - wedding_hall: SELECT conm, min_fee, subway FROM wedding_hall  
-   - makeup: SELECT conm, min_fee, subway FROM makeup
-   - studio: SELECT conm, std_price, subway FROM studio
-
-3. 지역 필터링:
-   - 지역명이나 지하철역명이 언급되면 subway 컬럼에서 LIKE 검색
-   - 예: "청담역" → WHERE subway LIKE '%청담%'
-   - 예: "강남" → WHERE subway LIKE '%강남%'
-
-4. 예산 필터링:
-   - 예산 정보가 있으면 가격 컬럼 활용 (min_fee 또는 std_price)
-   - 예산 범위 내의 업체만 조회
-   - 예산에서 숫자 추출: "5000만원" → 50000000
-
-5. 결과 제한:
-   - 요청에서 "3곳", "5개" 등 숫자가 언급되면 그 수만큼 LIMIT
-   - 언급이 없으면 기본적으로 LIMIT 5
-
-6. 정렬:
-   - 예산이 있으면 가격 컬럼 오름차순 정렬 (저렴한 순)
-   - 예산이 없으면 conm 오름차순 정렬 (이름순)
-
-**중요: address, tel 컬럼은 존재하지 않으므로 절대 사용하지 마세요**
+**조건 작성 규칙:**
+1. vendor_type (업체 유형):
+   - "드레스" 관련 요청 → wedding_dress
+   - "웨딩홀", "예식장" 관련 요청 → wedding_hall
+   - "스튜디오", "촬영" 관련 요청 → studio
+   - "메이크업" 관련 요청 → makeup
 
-예시:
-- "청담역 근처 드레스 3곳 추천해줘" 
-  → SELECT conm, min_fee, subway FROM wedding_dress WHERE subway LIKE '%청담%' ORDER BY min_fee ASC LIMIT 3
+2. region (지역):
+   - 요청에 지역명이나 지하철역명이 있으면 그 이름만 (예: "청담역" → "청담", "강남" → "강남")
+   - 요청에 없으면 선호 지역 사용, 둘 다 없으면 null
 
-- "강남 스튜디오 찾아줘"
-  → SELECT conm, std_price, subway FROM studio WHERE subway LIKE '%강남%' ORDER BY std_price ASC LIMIT 5
+3. max_price (예산, 만원 단위 정수 - DB 가격 컬럼이 만원 단위):
+   - 예산 정보가 있으면 만원 단위 숫자로 변환: "5000만원" → 5000, "1억" → 10000, "200만원" → 200
+   - 없으면 null
 
-SQL 쿼리만 반환하세요 (설명이나 백틱 없이):
+4. limit (결과 개수):
+   - 요청에서 "3곳", "5개" 등 숫자가 언급되면 그 수
+   - 언급이 없으면 5
+
+예시:
+- "청담역 근처 드레스 3곳 추천해줘" → vendor_type=wedding_dress, region=청담, max_price=null, limit=3
+- "강남 스튜디오 찾아줘" → vendor_type=studio, region=강남, max_price=null, limit=5
 """
         
-        # SQL 쿼리 생성
-        sql_response = llm.invoke([HumanMessage(content=sql_generation_prompt)])
-        sql_query = sql_response.content.strip()
-        
-        # SQL 정리 (혹시 있을 특수문자 제거)
-        sql_query = sql_query.replace('```sql', '').replace('```', '').strip()
-        
-        # 세미콜론 제거 (보안상 안전)
-        if sql_query.endswith(';'):
-            sql_query = sql_query[:-1]
-        
-        print(f"[DEBUG] 생성된 SQL: {sql_query}")
+        # 검색 조건 생성 (structured output으로 형식 강제)
+        condition = vendor_query_llm.invoke([HumanMessage(content=condition_prompt)])
+        print(f"[DEBUG] 추출된 검색 조건: {condition}")
+        
+        sql_query = DB_QUERY_SQL[condition["vendor_type"]]
+        region = (condition.get("region") or "").strip()
+        params = {
+            "region": f"%{region}%" if region else None,
+            "max_price": condition.get("max_price") or None,
+            "by_price": bool(condition.get("max_price")),
+            "limit": min(max(condition.get("limit") or 5, 1), DB_QUERY_MAX_ROWS),
+        }
         
-        # SQL 실행 (안전한 방법으로)
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=os.getenv('POSTGRES_PORT', '5432'), 
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
+        print(f"[DEBUG] 실행할 SQL: {sql_query}")
+        print(f"[DEBUG] 파라미터: {params}")
         
-        with conn.cursor() as cur:
-            cur.execute(sql_query)
+        # SQL 실행 - 값은 드라이버 파라미터 바인딩으로만 전달 (LIMIT이 DB_QUERY_MAX_ROWS 이하로 고정)
+        with get_pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(sql_query, params)
             rows = cur.fetchall()
             columns = [desc[0] for desc in cur.description]
         
-        conn.close()
-        
         print(f"[DEBUG] 조회된 행 수: {len(rows)}")
         print(f"[DEBUG] 컬럼명: {columns}")
             
@@ -205,7 +221,7 @@ SQL 쿼리만 반환하세요 (설명이나 백틱 없이):
                     value = "정보없음"
                 # 가격 컬럼 포맷팅 (숫자인 경우 천 단위 콤마 추가)
                 elif col in ['min_fee', 'std_price'] and isinstance(value, (int, float)):
-                    value = f"{int(value):,}원"
+                    value = f"{int(value):,}만원"
                 # 전화번호 포맷팅
                 elif col == 'tel' and value and value != "정보없음":
                     value = str(value).strip()
@@ -218,6 +234,7 @@ SQL 쿼리만 반환하세요 (설명이나 백틱 없이):
         return {
             "status": "success",
             "query": sql_query,
+            "params": params,
             "results": results,
             "count": len(results),
             "message": f"{len(results)}개의 업체를 찾았습니다."
@@ -425,6 +442,60 @@ def memo_update_tool(update_data: str) -> Dict[str, Any]:
             "message": "메모 업데이트 중 오류가 발생했습니다."
         }
 
+# 툴별 실행 함수 - 모두 (사용자 메시지, 메모, 앞서 실행된 툴 결과)를 받아 툴 결과를 반환
+def _run_db_query(user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return db_query_tool(user_message, user_memo)
+
+def _run_web_search(user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    # DB 쿼리 결과가 있으면 컨텍스트로 전달 (안전한 방식)
+    context_data = None
+    if "db_query" in results and isinstance(results["db_query"], dict):
+        context_data = {"db_query": results["db_query"]}
+    return web_search_tool(user_message, context_data)
+
+def _run_calculator(user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return calculator_tool(user_message, user_memo)
+
+def _run_memo_update(user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return memo_update_tool(json.dumps(user_memo) if user_memo else "{}")
+
+def _run_user_db_update(user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    # 사용자 일정 관리 툴 - 메시지에서 액션과 데이터 파싱
+    action, schedule_data = _parse_schedule_request(user_message)
+    return user_db_update_tool(action, schedule_data, user_memo)
+
+# 툴 이름 → 실행 함수 (if/elif 비교 대신 한 번의 dict 조회로 찾음)
+TOOL_RUNNERS = {
+    "db_query": _run_db_query,
+    "web_search": _run_web_search,
+    "calculator": _run_calculator,
+    "memo_update": _run_memo_update,
+    "user_db_update": _run_user_db_update,
+}
+
+# 다른 툴 결과를 입력으로 쓰는 툴 → 먼저 끝나야 하는 툴 (web_search는 db_query 결과를 검색 컨텍스트로 사용)
+TOOL_DEPENDENCIES = {
+    "web_search": ("db_query",),
+}
+
+def _run_tool(tool_name: str, user_message: str, user_memo: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    """툴 하나 실행 (오류는 툴별 에러 결과로 변환)"""
+    try:
+        print(f"[DEBUG] {tool_name} 툴 실행 시작")
+        
+        runner = TOOL_RUNNERS.get(tool_name)
+        if runner:
+            result = runner(user_message, user_memo, results)
+        else:
+            result = {"status": "error", "error": f"Unknown tool: {tool_name}"}
+            
+        print(f"[DEBUG] {tool_name} 툴 실행 완료: {result.get('status', 'unknown')}")
+        return result
+            
+    except Exception as e:
+        print(f"[ERROR] {tool_name} 툴 실행 중 오류: {e}")
+        return {"status": "error", "error": str(e)}
+
 # 툴 실행 헬퍼 함수 (개선된 버전 - 툴 간 데이터 전달 지원)
 def execute_tools(tools_needed: List[str], user_message: str, user_memo: Dict[str, Any] = None) -> Dict[str, Any]:
     """
@@ -437,43 +508,41 @@ def execute_tools(tools_needed: List[str], user_message: str, user_memo: Dict[st
     print(f"[DEBUG] 사용자 메모: {user_memo}")
     
     for tool_name in tools_needed:
-        try:
-            print(f"[DEBUG] {tool_name} 툴 실행 시작")
-            
-            if tool_name == "db_query":
-                results[tool_name] = db_query_tool(user_message, user_memo)
-                
-            elif tool_name == "web_search":
-                # DB 쿼리 결과가 있으면 컨텍스트로 전달 (안전한 방식)
-                context_data = None
-                if "db_query" in results and isinstance(results["db_query"], dict):
-                    context_data = {"db_query": results["db_query"]}
-                results[tool_name] = web_search_tool(user_message, context_data)
-                
-            elif tool_name == "calculator":
-                results[tool_name] = calculator_tool(user_message, user_memo)
-                
-            elif tool_name == "memo_update":
-                results[tool_name] = memo_update_tool(json.dumps(user_memo) if user_memo else "{}")
-                
-            elif tool_name == "user_db_update":
-                # 사용자 일정 관리 툴 추가
-                # 메시지에서 액션과 데이터 파싱
-                action, schedule_data = _parse_schedule_request(user_message)
-                results[tool_name] = user_db_update_tool(action, schedule_data, user_memo)
-                
-            else:
-                results[tool_name] = {"status": "error", "error": f"Unknown tool: {tool_name}"}
-                
-            print(f"[DEBUG] {tool_name} 툴 실행 완료: {results[tool_name].get('status', 'unknown')}")
-                
-        except Exception as e:
-            print(f"[ERROR] {tool_name} 툴 실행 중 오류: {e}")
-            results[tool_name] = {"status": "error", "error": str(e)}
+        results[tool_name] = _run_tool(tool_name, user_message, user_memo, results)
     
     print(f"[DEBUG] 모든 툴 실행 완료: {list(results.keys())}")
     return results
 
+async def aexecute_tools(tools_needed: List[str], user_message: str, user_memo: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    execute_tools의 비동기 버전 - 서로 의존하지 않는 툴은 동시에 실행
+    (DB/웹 검색/LLM 호출이 모두 IO 대기라 전체 시간이 합이 아니라 가장 느린 툴 기준이 됨)
+    """
+    results = {}
+    tasks = {}
+    
+    print(f"[DEBUG] 실행할 툴들 (병렬): {tools_needed}")
+    print(f"[DEBUG] 사용자 메시지: {user_message}")
+    print(f"[DEBUG] 사용자 메모: {user_memo}")
+    
+    async def run(tool_name):
+        # 이번 요청에 의존 대상 툴이 있으면 그 결과가 나온 뒤에 실행
+        for dependency in TOOL_DEPENDENCIES.get(tool_name, ()):
+            if dependency in tasks:
+                await tasks[dependency]
+        # 툴 함수는 동기 함수라 스레드에서 실행해 이벤트 루프를 막지 않음
+        results[tool_name] = await asyncio.to_thread(_run_tool, tool_name, user_message, user_memo, results)
+    
+    # 모든 태스크를 등록한 뒤에 실행이 시작되므로 의존 대상의 순서와 상관없이 기다릴 수 있음
+    for tool_name in tools_needed:
+        if tool_name not in tasks:
+            tasks[tool_name] = asyncio.create_task(run(tool_name))
+    await asyncio.gather(*tasks.values())
+    
+    print(f"[DEBUG] 모든 툴 실행 완료: {list(tasks.keys())}")
+    # 요청한 툴 순서대로 반환
+    return {tool_name: results[tool_name] for tool_name in tasks}
+
 def _parse_schedule_request(user_message: str) -> tuple[str, Dict[str, Any]]:
     """
     사용자 메시지에서 일정 관련 액션과 데이터를 파싱
@@ -591,124 +660,110 @@ def user_db_update_tool(action: str, schedule_data: Dict[str, Any] = None, user_
 def _get_user_schedules(user_id: str, limit: int = 20) -> Dict[str, Any]:
     """사용자 일정 목록 조회"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=os.getenv('POSTGRES_PORT', '5432'), 
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, title, scheduled_date, scheduled_time, status, 
-                       category, description, priority, created_at, updated_at
-                FROM user_schedule 
-                WHERE user_id = %s 
-                ORDER BY scheduled_date ASC, scheduled_time ASC
-                LIMIT %s
-            """, (user_id, limit))
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id, title, scheduled_date, scheduled_time, status, 
+                           category, description, priority, created_at, updated_at
+                    FROM user_schedule 
+                    WHERE user_id = %s 
+                    ORDER BY scheduled_date ASC, scheduled_time ASC
+                    LIMIT %s
+                """, (user_id, limit))
             
-            rows = cur.fetchall()
-            columns = [desc[0] for desc in cur.description]  # 이 부분 수정
+                rows = cur.fetchall()
+                columns = [desc[0] for desc in cur.description]  # 이 부분 수정
             
-            schedules = []
-            for row in rows:
-                schedule = {}
-                for i, col in enumerate(columns):
-                    value = row[i]
-                    # 날짜/시간 포맷팅
-                    if col in ['scheduled_date'] and value:
-                        value = value.strftime('%Y-%m-%d')
-                    elif col in ['scheduled_time'] and value:
-                        value = value.strftime('%H:%M')
-                    elif col in ['created_at', 'updated_at'] and value:
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    schedule[col] = value
-                schedules.append(schedule)
-        
-        conn.close()  # 연결 종료 추가
+                schedules = []
+                for row in rows:
+                    schedule = {}
+                    for i, col in enumerate(columns):
+                        value = row[i]
+                        # 날짜/시간 포맷팅
+                        if col in ['scheduled_date'] and value:
+                            value = value.strftime('%Y-%m-%d')
+                        elif col in ['scheduled_time'] and value:
+                            value = value.strftime('%H:%M')
+                        elif col in ['created_at', 'updated_at'] and value:
+                            value = value.strftime('%Y-%m-%d %H:%M:%S')
+                        schedule[col] = value
+                    schedules.append(schedule)
         
-        return {
-            "status": "success",
-            "schedules": schedules,
-            "count": len(schedules),
-            "message": f"{len(schedules)}개의 일정을 찾았습니다."
-        }
+            return {
+                "status": "success",
+                "schedules": schedules,
+                "count": len(schedules),
+                "message": f"{len(schedules)}개의 일정을 찾았습니다."
+            }
             
     except Exception as e:
         print(f"[ERROR] 일정 조회 오류: {e}")
-        if 'conn' in locals():
-            conn.close()
         return {"status": "error", "error": str(e)}
 
 def _add_user_schedule(user_id: str, schedule_data: Dict[str, Any]) -> Dict[str, Any]:
     try:
         # 기존의 SQLAlchemy 방식 대신 psycopg2 사용
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=os.getenv('POSTGRES_PORT', '5432'), 
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-        
-        title = schedule_data.get("title", "").strip().strip('"')
-        if not title:
-            return {"status": "error", "error": "일정 제목은 필수입니다."}
-        
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO user_schedule 
-                (user_id, title, scheduled_date, scheduled_time, status, category, description, priority)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                RETURNING id
-            """, (
-                user_id,
-                title,
-                schedule_data.get("scheduled_date"),
-                schedule_data.get("scheduled_time"),
-                schedule_data.get("status", "pending"),
-                schedule_data.get("category", "general"),
-                schedule_data.get("description", ""),
-                schedule_data.get("priority", "medium")
-            ))
+        with get_pg_connection() as conn:
+            title = schedule_data.get("title", "").strip().strip('"')
+            if not title:
+                return {"status": "error", "error": "일정 제목은 필수입니다."}
+        
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO user_schedule 
+                    (user_id, title, scheduled_date, scheduled_time, status, category, description, priority)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
+                """, (
+                    user_id,
+                    title,
+                    schedule_data.get("scheduled_date"),
+                    schedule_data.get("scheduled_time"),
+                    schedule_data.get("status", "pending"),
+                    schedule_data.get("category", "general"),
+                    schedule_data.get("description", ""),
+                    schedule_data.get("priority", "medium")
+                ))
             
-            new_id = cur.fetchone()[0]
-            conn.commit()
-            
-        conn.close()
+                new_id = cur.fetchone()[0]
+                conn.commit()
         
-        return {
-            "status": "success",
-            "id": new_id,
-            "message": f"일정 '{title}'이 추가되었습니다."
-        }
+            return {
+                "status": "success",
+                "id": new_id,
+                "message": f"일정 '{title}'이 추가되었습니다."
+            }
         
     except Exception as e:
         print(f"[ERROR] 일정 추가 오류: {e}")
         return {"status": "error", "error": str(e)}
 
+# 일정 수정 시 변경 가능한 컬럼 (이 순서대로 SET 절을 만들어 같은 컬럼 조합이면 같은 SQL이 되도록 함)
+SCHEDULE_UPDATE_FIELDS = ("title", "scheduled_date", "scheduled_time", "status", "category", "description", "priority")
+
+@lru_cache(maxsize=64)
+def _update_schedule_sql(columns: tuple) -> str:
+    """수정할 컬럼 조합별 UPDATE 문 (한 번 만든 문자열은 재사용)"""
+    set_clause = ", ".join(f"{col} = %s" for col in columns)
+    return f"""
+        UPDATE user_schedule 
+        SET {set_clause}, updated_at = NOW()
+        WHERE id = %s
+        RETURNING title
+    """
+
 def _update_user_schedule(schedule_data: Dict[str, Any]) -> Dict[str, Any]:
     """기존 일정 수정"""
     try:
-        conn = psycopg2.connect(
-        host=os.getenv('POSTGRES_HOST'),
-        port=os.getenv('POSTGRES_PORT', '5432'), 
-        database=os.getenv('POSTGRES_DB'),
-        user=os.getenv('POSTGRES_USER'),
-        password=os.getenv('POSTGRES_PASSWORD')
-        )
-        
         schedule_id = schedule_data.get("id")
         if not schedule_id:
             return {"status": "error", "error": "일정 ID가 필요합니다."}
         
         # 업데이트할 필드들 동적으로 구성
-        update_fields = []
-        params = {"id": schedule_id}
+        columns = []
+        values = []
         
-        for field in ["title", "scheduled_date", "scheduled_time", "status", "category", "description", "priority"]:
+        for field in SCHEDULE_UPDATE_FIELDS:
             if field in schedule_data:
                 value = schedule_data[field]
                 
@@ -724,40 +779,26 @@ def _update_user_schedule(schedule_data: Dict[str, Any]) -> Dict[str, Any]:
                     except ValueError:
                         continue
                 
-                update_fields.append(f"{field} = :{field}")
-                params[field] = value
+                columns.append(field)
+                values.append(value)
         
-        if not update_fields:
+        if not columns:
             return {"status": "error", "error": "업데이트할 필드가 없습니다."}
         
-        # updated_at 자동 업데이트
-        update_fields.append("updated_at = NOW()")
+        values.append(schedule_id)
         
-        with conn.cursor() as cur:
-            query = f"""
-                UPDATE user_schedule 
-                SET {', '.join(update_fields)}
-                WHERE id = %s
-                RETURNING title
-            """
-            
-            # 파라미터 순서 조정 필요
-            values = [params[field.split(' = ')[0]] for field in update_fields if ' = ' in field]
-            values.append(schedule_id)
-            
-            cur.execute(query, values)
-            result = cur.fetchone()
-            conn.commit()
-            
-            updated_row = result.fetchone()
-            if updated_row:
-                title = updated_row[0]
-                return {
-                    "status": "success",
-                    "message": f"일정 '{title}'이 수정되었습니다."
-                }
-            else:
-                return {"status": "error", "error": "일정을 찾을 수 없습니다."}
+        with get_pg_connection() as conn, conn.cursor() as cur:
+            cur.execute(_update_schedule_sql(tuple(columns)), values)
+            updated_row = cur.fetchone()
+        
+        if updated_row:
+            title = updated_row[0]
+            return {
+                "status": "success",
+                "message": f"일정 '{title}'이 수정되었습니다."
+            }
+        else:
+            return {"status": "error", "error": "일정을 찾을 수 없습니다."}
                 
     except Exception as e:
         print(f"[ERROR] 일정 수정 오류: {e}")
@@ -766,20 +807,19 @@ def _update_user_schedule(schedule_data: Dict[str, Any]) -> Dict[str, Any]:
 def _delete_user_schedule(schedule_id: int) -> Dict[str, Any]:
     """일정 삭제"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=os.getenv('POSTGRES_PORT', '5432'), 
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-
-        with conn.cursor() as cur:
-            cur.execute("SELECT title FROM user_schedule WHERE id = %s", (schedule_id,))
-            row = cur.fetchone()
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                # 존재 확인 SELECT 없이 한 번의 DELETE로 삭제 + 제목 조회
+                cur.execute("DELETE FROM user_schedule WHERE id = %s RETURNING title", (schedule_id,))
+                row = cur.fetchone()
             
-            cur.execute("DELETE FROM user_schedule WHERE id = %s", (schedule_id,))
-            conn.commit()
+        if row:
+            return {
+                "status": "success",
+                "message": f"일정 '{row[0]}'이 삭제되었습니다."
+            }
+        else:
+            return {"status": "error", "error": "일정을 찾을 수 없습니다."}
                     
     except Exception as e:
         print(f"[ERROR] 일정 삭제 오류: {e}")
@@ -788,34 +828,24 @@ def _delete_user_schedule(schedule_id: int) -> Dict[str, Any]:
 def _complete_user_schedule(schedule_id: int) -> Dict[str, Any]:
     """일정 완료 처리"""
     try:
-        conn = psycopg2.connect(
-            host=os.getenv('POSTGRES_HOST'),
-            port=os.getenv('POSTGRES_PORT', '5432'), 
-            database=os.getenv('POSTGRES_DB'),
-            user=os.getenv('POSTGRES_USER'),
-            password=os.getenv('POSTGRES_PASSWORD')
-        )
-
-        with conn.cursor() as cur:
-            cur.execute("""
-                UPDATE user_schedule 
-                SET status = 'completed', updated_at = NOW()
-                WHERE id = %s
-                RETURNING title
-            """, (schedule_id,))
+        with get_pg_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE user_schedule 
+                    SET status = 'completed', updated_at = NOW()
+                    WHERE id = %s
+                    RETURNING title
+                """, (schedule_id,))
             
-            result = cur.fetchone()
-            conn.commit()
-            
-            updated_row = result.fetchone()
-            if updated_row:
-                title = updated_row[0]
-                return {
-                    "status": "success",
-                    "message": f"일정 '{title}'이 완료되었습니다."
-                }
-            else:
-                return {"status": "error", "error": "일정을 찾을 수 없습니다."}
+                updated_row = cur.fetchone()
+                if updated_row:
+                    title = updated_row[0]
+                    return {
+                        "status": "success",
+                        "message": f"일정 '{title}'이 완료되었습니다."
+                    }
+                else:
+                    return {"status": "error", "error": "일정을 찾을 수 없습니다."}
                 
     except Exception as e:
         print(f"[ERROR] 일정 완료 처리 오류: {e}")
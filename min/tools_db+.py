@@ -6,7 +6,7 @@ from langchain_core.tools import tool
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from langchain_community.tools.tavily_search import TavilySearchResults
-from db import db, engine
+from db import engine, table_info
 import sqlalchemy as sa
 from dotenv import load_dotenv
 
@@ -98,15 +98,15 @@ def db_query_tool(query_request: str, user_memo: Dict[str, Any] = None) -> Dict[
         print(f"[DEBUG] 추출된 선호지역: {location}")
         
         # 테이블 정보 가져오기
-        table_info = db.get_table_info()
-        print(f"[DEBUG] 사용 가능한 테이블: {table_info[:500]}...")
+        schema_info = table_info()
+        print(f"[DEBUG] 사용 가능한 테이블: {schema_info[:500]}...")
         
         # 개선된 SQL 생성 프롬프트 (실제 컬럼만 사용)
         sql_generation_prompt = f"""
 다음 테이블 정보를 참고해서 사용자 요청에 맞는 SQL 쿼리를 작성해주세요.
 
 테이블 정보:
-{table_info}
+{schema_info}
 
 사용자 요청: {actual_query}
 사용자 예산: {budget}